@@ -0,0 +1,287 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from MultiGraph import *
+
+
+# Память на одну вершину, ребро и гиперребро MultiGraph (по данным tracemalloc)
+# Запуск: python Benchmark.py memory 100000 1000000 10000000
+def bench_memory(*sizes):
+    sizes = [int(size) for size in sizes] or [10 ** 5, 10 ** 6, 10 ** 7]
+    hyperedge_size = 10
+
+    for n in sizes:
+        tracemalloc.start()
+        start_time = time.time()
+
+        base = tracemalloc.get_traced_memory()[0]
+        graph = MultiGraph()
+        graph.add_vertices(Vertex(i) for i in range(n))
+        vertex_bytes = (tracemalloc.get_traced_memory()[0] - base) / n
+
+        base = tracemalloc.get_traced_memory()[0]
+        for i in range(n):
+            graph.add_edge(Edge(i + 1, 1, i, random.randrange(n)))
+        edge_bytes = (tracemalloc.get_traced_memory()[0] - base) / n
+
+        hyperedge_count = n // hyperedge_size
+        base = tracemalloc.get_traced_memory()[0]
+        for i in range(hyperedge_count):
+            graph.add_hyperedge(Hyperedge(i + 1, 1, list(range(i * hyperedge_size, (i + 1) * hyperedge_size))))
+        hyperedge_bytes = (tracemalloc.get_traced_memory()[0] - base) / hyperedge_count
+
+        tracemalloc.stop()
+        print(f'{n} вершин: вершина {vertex_bytes:.1f} Б, ребро {edge_bytes:.1f} Б, '
+              f'гиперребро из {hyperedge_size} вершин {hyperedge_bytes:.1f} Б ({time.time() - start_time:.1f}с.)')
+
+        del graph
+
+
+# Слияние двух вершин-хабов степени degree с половиной общих соседей (режим debug с ребрами)
+# Запуск: python Benchmark.py hubs 1000 10000 100000
+def bench_merge_hubs(*degrees):
+    degrees = [int(degree) for degree in degrees] or [10 ** 3, 10 ** 4, 10 ** 5]
+
+    for degree in degrees:
+        graph = MultiGraph([Vertex('hub1'), Vertex('hub2')])
+        graph.add_vertices(Vertex(i) for i in range(degree * 3 // 2))
+        edge_id = 1
+        for i in range(degree):
+            graph.add_edge(Edge(edge_id, random.randint(1, 10), 'hub1', i))
+            graph.add_edge(Edge(edge_id + 1, random.randint(1, 10), 'hub2', i + degree // 2))
+            edge_id += 2
+
+        start_time = time.time()
+        graph.merge_vertex(graph.vertices['hub1'], graph.vertices['hub2'], True)
+        print(f'Слияние хабов степени {degree}: {time.time() - start_time:.4f}с.')
+
+
+# Скорость CleanData.clean_df до (построчно), после векторизации и в пуле процессов
+# Запуск: python Benchmark.py clean dataset.csv 10000
+def bench_clean(file_path='dataset.csv', rows=10000):
+    import pandas as pd
+    from CleanData import CleanData
+
+    df = pd.read_csv(file_path, nrows=int(rows))
+    for name, clean in [('построчно', CleanData.clean_df_rowwise), ('векторизованно', CleanData.clean_df),
+                        ('параллельно', CleanData.clean_df_parallel)]:
+        start_time = time.time()
+        clean(df)
+        elapsed = time.time() - start_time
+        print(f'clean_df {name}: {len(df)} строк за {elapsed:.2f}с. ({len(df) / elapsed:.0f} строк/с)')
+
+
+# Jaro до (построчный jaro_metric) и после (Similarity.jaro_to_reference) на колонке из cells ячеек
+# Запуск: python Benchmark.py jaro 1000000
+def bench_jaro(cells=10 ** 6):
+    import numpy as np
+    from Similarity import Similarity
+
+    cells = int(cells)
+    alphabet = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+    values = np.array([''.join(random.choices(alphabet, k=random.randint(5, 30))) for _ in range(cells)], dtype=object)
+    reference = max(values, key=len)
+    Similarity.jaro_to_reference(values[:10], reference)
+
+    sample = values[:max(cells // 100, 1)]
+    start_time = time.time()
+    for value in sample:
+        Similarity.jaro_metric(value, reference)
+    scalar = (time.time() - start_time) * len(values) / len(sample)
+    print(f'jaro_metric построчно: {cells} ячеек примерно за {scalar:.2f}с. (по выборке {len(sample)})')
+
+    start_time = time.time()
+    Similarity.jaro_to_reference(values, reference)
+    vector = time.time() - start_time
+    print(f'Similarity.jaro_to_reference: {cells} ячеек за {vector:.2f}с. (ускорение x{scalar / vector:.0f})')
+
+
+# Компоненты связности по массивам ребер и полная сборка гиперребер из MultiGraph
+# Запуск: python Benchmark.py clusters 10000000 100000
+def bench_clusters(edges=10 ** 7, graph_edges=10 ** 5):
+    import numpy as np
+    from Clusters import ClusterBuilder
+
+    edges = int(edges)
+    n = edges // 2
+    v1 = np.random.randint(0, n, edges)
+    v2 = np.random.randint(0, n, edges)
+    weights = np.random.rand(edges)
+    start_time = time.time()
+    labels, sums, counts = ClusterBuilder.components(n, v1, v2, weights)
+    print(f'Компоненты по {edges} ребрам: {len(sums)} шт. за {time.time() - start_time:.2f}с.')
+
+    graph_edges = int(graph_edges)
+    graph = MultiGraph()
+    graph.add_vertices(Vertex(i) for i in range(graph_edges))
+    for i in range(graph_edges):
+        graph.add_edge(Edge(i + 1, random.random(), random.randrange(graph_edges), random.randrange(graph_edges)))
+    start_time = time.time()
+    hyperedges = ClusterBuilder(graph, 0.5).build()
+    print(f'ClusterBuilder.build по {len(graph.edges)} ребрам графа: {len(hyperedges)} гиперребер за {time.time() - start_time:.2f}с.')
+
+
+# Золотые записи кластеров из PropertyStore: по одному кластеру (merge_cluster_rows)
+# и одним этапом для всех кластеров (merge_clusters)
+def bench_golden(clusters=20000, size=4, columns=20):
+    clusters, size, columns = int(clusters), int(size), int(columns)
+    names = [f'p{i}' for i in range(columns)]
+    dates = [f'20{year:02d}-0{month}-1{day}' for year in range(24) for month in range(1, 10) for day in range(10)]
+
+    def build():
+        store = PropertyStore(names)
+        vertices = []
+        for i in range(clusters * size):
+            row = store.append_row([f'v{i}'] * columns, [random.choice([1, 1, 0, -1]) for _ in names])
+            vertices.append(Vertex(i + 1, store=store, row=row, last_update=random.choice(dates), completeness_coef=random.random()))
+        return MultiGraph(vertices)
+
+    ids = [list(range(i * size + 1, (i + 1) * size + 1)) for i in range(clusters)]
+
+    graph = build()
+    start_time = time.time()
+    for v_ids in ids:
+        graph.merge_cluster_rows([graph.vertices[v_id] for v_id in v_ids])
+    print(f'merge_cluster_rows по одному кластеру: {clusters} x {size} за {time.time() - start_time:.2f}с.')
+
+    graph = build()
+    start_time = time.time()
+    graph.merge_clusters(ids)
+    print(f'merge_clusters одним этапом: {clusters} x {size} за {time.time() - start_time:.2f}с.')
+
+# Сохранение и загрузка графа: pickle (как снимки журнала) против GraphSnapshot
+# Запуск: python Benchmark.py snapshot 1000000
+def bench_snapshot(vertices=10 ** 6, path='bench_snapshot'):
+    import pickle
+    import shutil
+    from Snapshot import GraphSnapshot
+
+    vertices = int(vertices)
+    names = ['client_fio_full', 'client_bday', 'contact_phone', 'contact_email']
+    store = PropertyStore(names)
+    graph = MultiGraph()
+    graph.add_vertices(Vertex(i, store=store, row=store.append_row([f'Имя {i}', '01.01.1990', 79160000000 + i, float('nan')]))
+                       for i in range(vertices))
+    for i in range(vertices):
+        graph.add_edge(Edge(i + 1, random.random(), i, random.randrange(vertices)))
+
+    start_time = time.time()
+    with open(path + '.pickle', 'wb') as file:
+        pickle.dump(graph, file, protocol=pickle.HIGHEST_PROTOCOL)
+    save_time = time.time() - start_time
+    start_time = time.time()
+    with open(path + '.pickle', 'rb') as file:
+        pickle.load(file)
+    print(f'pickle: сохранение {save_time:.2f}с., загрузка {time.time() - start_time:.2f}с.')
+
+    start_time = time.time()
+    GraphSnapshot.save(graph, path)
+    save_time = time.time() - start_time
+    start_time = time.time()
+    GraphSnapshot.load(path)
+    print(f'GraphSnapshot: сохранение {save_time:.2f}с., загрузка {time.time() - start_time:.2f}с.')
+
+    # Только массивы (SnapshotArrays) и расчет компонент по ним
+    from Clusters import ClusterBuilder
+    start_time = time.time()
+    arrays = GraphSnapshot.open(path)
+    open_time = time.time() - start_time
+    ClusterBuilder.components(arrays.vertex_count, arrays.edge_ends[:, 0], arrays.edge_ends[:, 1], arrays.edge_weight)
+    print(f'GraphSnapshot.open: {open_time:.3f}с., компоненты по массивам {time.time() - start_time - open_time:.2f}с.')
+    del arrays
+
+    os.remove(path + '.pickle')
+    shutil.rmtree(path)
+
+# Прежний CombinedGraph на списках: только операции, которые сравниваются в bench_combined
+class ListCombinedGraph:
+    def __init__(self, vertices):
+        self.vertices = list(vertices)
+        self.edges = []
+
+    def fill_edges(self, edges):
+        self.edges = []
+        self.edges.extend(edges)
+        for edge in edges:
+            if edge.vertex1 in self.vertices:
+                self.vertices[self.vertices.index(edge.vertex1)].edges.add(edge)
+            if edge.vertex2 in self.vertices:
+                self.vertices[self.vertices.index(edge.vertex2)].edges.add(edge)
+
+    def get_vertex(self, vertex_name):
+        return next((v for v in self.vertices if v.name == vertex_name), None)
+
+    def remove_vertex(self, vertex_name):
+        for vertex in list(self.vertices):
+            if vertex.name == vertex_name:
+                self.vertices.remove(vertex)
+                break
+
+    def remove_edge(self, other_edge):
+        for edge in list(self.edges):
+            if ((edge.vertex1.name == other_edge.vertex1.name and edge.vertex2.name == other_edge.vertex2.name) or
+                (edge.vertex1.name == other_edge.vertex2.name and edge.vertex2.name == other_edge.vertex1.name)):
+                self.edges.remove(edge)
+                break
+
+
+# CombinedGraph на словарях против прежней списочной версии на n вершинах и n ребрах.
+# Списочная версия медленная, поэтому для нее время меряется на выборке из sample операций
+# Запуск: python Benchmark.py combined 100000 100
+def bench_combined(n=10 ** 5, sample=100):
+    import Graph
+
+    n = int(n)
+    sample = int(sample)
+    vertices = [Graph.Vertex(f'v{i}') for i in range(n)]
+    edges = [Graph.Edge(i, vertices[i], vertices[(i * 7919 + 1) % n], random.randint(1, 10)) for i in range(n)]
+    names = [vertex.name for vertex in random.sample(vertices, sample)]
+
+    new_graph = Graph.CombinedGraph()
+    new_graph.fill_vertices(vertices)
+    old_graph = ListCombinedGraph(vertices)
+
+    def measure(operation, items, total):
+        start_time = time.time()
+        for item in items:
+            operation(item)
+        return (time.time() - start_time) * total / len(items)
+
+    results = []
+    start_time = time.time()
+    new_graph.fill_edges(edges)
+    new_time = time.time() - start_time
+    old_time = measure(lambda edge: old_graph.fill_edges([edge]), random.sample(edges, sample), n)
+    results.append((f'fill_edges ({n} ребер)', old_time, new_time))
+
+    results.append((f'поиск вершины по имени (x{sample})',
+                    measure(old_graph.get_vertex, names, sample), measure(new_graph.get_vertex, names, sample)))
+
+    old_graph.edges = list(edges)
+    removed = random.sample(edges, sample)
+    results.append((f'remove_edge (x{sample})',
+                    measure(old_graph.remove_edge, removed, sample), measure(new_graph.remove_edge, removed, sample)))
+    results.append((f'remove_vertex (x{sample})',
+                    measure(old_graph.remove_vertex, names, sample), measure(new_graph.remove_vertex, names, sample)))
+
+    for name, old_time, new_time in results:
+        print(f'{name}: списки {old_time:.3f}с., словари {new_time:.4f}с. (x{old_time / max(new_time, 1e-9):.0f})')
+
+
+BENCHMARKS = {
+    'memory': bench_memory,
+    'hubs': bench_merge_hubs,
+    'clean': bench_clean,
+    'jaro': bench_jaro,
+    'clusters': bench_clusters,
+    'golden': bench_golden,
+    'snapshot': bench_snapshot,
+    'combined': bench_combined,
+}
+
+if __name__ == '__main__':
+    name = sys.argv[1] if len(sys.argv) > 1 else 'memory'
+    BENCHMARKS[name](*sys.argv[2:])
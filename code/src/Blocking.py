@@ -0,0 +1,155 @@
+import re
+from itertools import combinations
+
+import pandas as pd
+
+from CleanData import CleanData
+from MultiGraph import *
+
+
+# Индекс блокировки для поиска дублей без сравнения всех пар:
+# вершины с одинаковым ключом (СНИЛС, ИНН, телефон, email, ФИО) попадают в один блок,
+# и кандидатами считаются только пары внутри блока
+class BlockingIndex:
+    # Ключ -> вес, который он добавляет паре. Ключи одной пары суммируются
+    WEIGHTS = {
+        'snils': 1.0,
+        'inn': 1.0,
+        'phone': 0.6,
+        'email': 0.6,
+        'fio_phonetic': 0.4,
+        'fio_bday': 0.5,
+    }
+    # Таблицы BlockingIndex.phonetic: гласные, пары звонкий -> глухой и глухие согласные
+    VOWELS = str.maketrans({'о': 'а', 'ы': 'а', 'я': 'а', 'е': 'и', 'э': 'и', 'ю': 'у'})
+    DEVOICE = {'б': 'п', 'в': 'ф', 'г': 'к', 'д': 'т', 'ж': 'ш', 'з': 'с'}
+    VOICELESS = set('пфктшсхцчщ')
+
+    def __init__(self, weights: dict = None, max_block_size = 100):
+        self.weights = dict(weights or BlockingIndex.WEIGHTS)
+        # Ограничение размера блока: общее число или словарь ключ -> предел.
+        # Блоки больше предела (заглушки вида 00000000000, популярные ФИО) пропускаются
+        self.max_block_size = max_block_size
+        self.blocks = {}
+        self.skipped_blocks = 0
+
+    @staticmethod
+    def digits(value):
+        if value is None or pd.isna(value):
+            return ''
+        text = str(value)
+        # Числа из CSV приходят как float: 12345678901.0
+        if text.endswith('.0'):
+            text = text[:-2]
+        return re.sub(r'\D', '', text)
+
+    @staticmethod
+    def snils_key(vertex: Vertex):
+        snils = BlockingIndex.digits(vertex.get_property('client_snils'))
+        return snils if len(snils) == 11 and snils != '0' * 11 else None
+
+    @staticmethod
+    def inn_key(vertex: Vertex):
+        inn = BlockingIndex.digits(vertex.get_property('client_inn'))
+        return inn if len(inn) in [10, 12] and inn.strip('0') else None
+
+    @staticmethod
+    def phone_key(vertex: Vertex):
+        phone = BlockingIndex.digits(vertex.get_property('contact_phone'))
+        phone = CleanData.standardize_phone(phone)
+        return phone if isinstance(phone, str) else None
+
+    @staticmethod
+    def email_key(vertex: Vertex):
+        email = vertex.get_property('contact_email')
+        if not isinstance(email, str) or not re.fullmatch(CleanData.EMAIL_REGEX, email.strip()):
+            return None
+        return email.strip().lower()
+
+    @staticmethod
+    def fio(vertex: Vertex):
+        fio = vertex.get_property('client_fio_full')
+        if not isinstance(fio, str) or not fio.strip():
+            parts = [vertex.get_property(name) for name in ['client_first_name', 'client_middle_name', 'client_last_name']]
+            fio = ' '.join(part for part in parts if isinstance(part, str))
+        return fio.strip().lower()
+
+    # Фонетическое упрощение слова в духе русского Metaphone: ё -> е, ь и ъ отбрасываются,
+    # йо/ио/йе/ие -> и, гласные сводятся к а/и/у (о, ы, я -> а; е, э -> и; ю -> у),
+    # звонкие согласные на конце слова и перед глухими оглушаются (Иванов/Иваноф, Шмидт/Шмит),
+    # тс -> ц, сдвоенные буквы схлопываются
+    @staticmethod
+    def phonetic(word):
+        word = re.sub(r'[^а-яa-z]', '', word.lower().replace('ё', 'е'))
+        word = re.sub(r'[йи][ое]', 'и', word.replace('ь', '').replace('ъ', ''))
+        letters = list(word.translate(BlockingIndex.VOWELS))
+        # Справа налево, чтобы оглушение шло цепочкой (-вств, -здт)
+        for i in range(len(letters) - 1, -1, -1):
+            voiceless = BlockingIndex.DEVOICE.get(letters[i])
+            if voiceless is not None and (i == len(letters) - 1 or letters[i + 1] in BlockingIndex.VOICELESS):
+                letters[i] = voiceless
+        word = ''.join(letters).replace('тс', 'ц')
+        return re.sub(r'(.)\1+', r'\1', word)
+
+    # Фонетический ключ ФИО: фонетические коды слов в алфавитном порядке (порядок Ф, И, О не важен)
+    @staticmethod
+    def fio_phonetic_key(vertex: Vertex):
+        words = sorted(filter(None, (BlockingIndex.phonetic(word) for word in BlockingIndex.fio(vertex).split())))
+        return ' '.join(words) if words else None
+
+    # Префиксы слов ФИО + дата рождения: ловит опечатки в окончаниях
+    @staticmethod
+    def fio_bday_key(vertex: Vertex):
+        fio = BlockingIndex.fio(vertex)
+        bday = vertex.get_property('client_bday')
+        if not fio or not isinstance(bday, str) or not re.search(r'\d', bday):
+            return None
+        # Части даты сортируются, чтобы 05.06.1980 и 1980-06-05 дали один ключ
+        bday = '.'.join(sorted(re.findall(r'\d+', bday)))
+        return ' '.join(sorted(word[:3] for word in fio.split())) + '|' + bday
+
+    def add_vertex(self, vertex: Vertex):
+        for name in self.weights:
+            key = getattr(BlockingIndex, name + '_key')(vertex)
+            if key is not None:
+                self.blocks.setdefault((name, key), []).append(vertex.id)
+
+    def add_vertices(self, vertices):
+        for vertex in vertices:
+            self.add_vertex(vertex)
+
+    def block_limit(self, name):
+        if isinstance(self.max_block_size, dict):
+            return self.max_block_size.get(name)
+        return self.max_block_size
+
+    # Пары кандидатов с суммарным весом совпавших ключей: (id1, id2) -> вес.
+    # Вершины в блоках лежат в порядке добавления, поэтому одна пара из разных блоков
+    # всегда получается в одном и том же порядке
+    def candidate_pairs(self):
+        pairs = {}
+        self.skipped_blocks = 0
+        for (name, key), ids in self.blocks.items():
+            if len(ids) < 2:
+                continue
+            limit = self.block_limit(name)
+            if limit is not None and len(ids) > limit:
+                self.skipped_blocks += 1
+                continue
+
+            weight = self.weights[name]
+            for pair in combinations(ids, 2):
+                pairs[pair] = pairs.get(pair, 0) + weight
+
+        return pairs
+
+    # Добавляет кандидатов в граф ребрами с весом пары, возвращает число ребер
+    def add_edges(self, graph: MultiGraph, min_weight = 0):
+        count = 0
+        for (v1_id, v2_id), weight in self.candidate_pairs().items():
+            if weight < min_weight or v1_id not in graph.vertices or v2_id not in graph.vertices:
+                continue
+            graph.add_edge(Edge(graph.edge_ids.allocate(), round(weight, 6), v1_id, v2_id))
+            count += 1
+
+        return count
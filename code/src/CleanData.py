@@ -1,45 +1,235 @@
 import pandas as pd
 from datetime import datetime
+import multiprocessing
+import os
 import re
+from functools import lru_cache
 import numpy as np
 
+# Таблица перекодировки для str.translate: код символа -> его фрагмент в кодировке.
+# Фрагмент для символа считается функцией encode один раз, при первой встрече
+class TranslationTable(dict):
+    def __init__(self, encode):
+        super().__init__()
+        self.encode = encode
+
+    def __missing__(self, key):
+        value = self.encode(chr(key))
+        self[key] = value
+        return value
+
+
 class CleanData:
     @staticmethod
     def russian_alphabet_index(char):
         alphabet = "абвгдежзийклмнопрстуфхцчшщъыьэюя"
         return alphabet.find(char.lower()) + 1
 
+    # Код одного символа строки: разница его номера в алфавите с буквой 'а'
     @staticmethod
+    def similar_char(c2):
+        index1 = CleanData.russian_alphabet_index('а')
+        index2 = CleanData.russian_alphabet_index(c2)
+
+        if index1 == 0 or index2 == 0:
+            return "0"
+
+        difference = abs(index1 - index2)
+        difference_base32 = format(difference, 'x')
+
+        if difference < 32:
+            return difference_base32
+        else:
+            chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+            base32_str = ''
+            while difference:
+                difference, rem = divmod(difference, 32)
+                base32_str = chars[rem] + base32_str
+            return base32_str
+
+    # Сравниваются только первые 100 символов (длина строки-образца)
+    @staticmethod
+    @lru_cache(maxsize=1 << 16)
     def similar(s2):
-        s1 = 'а' * 100
-        s1 = s1[:len(s2)]
-        differences = ""
-        for c1, c2 in zip(s1, s2):
-            index1 = CleanData.russian_alphabet_index(c1)
-            index2 = CleanData.russian_alphabet_index(c2)
+        return s2[:100].translate(SIMILAR_TABLE)
+
+    # Кодирует столбец: каждое уникальное значение один раз, NaN -> ''
+    @staticmethod
+    def similar_column(values):
+        codes, uniques = pd.factorize(values)
+        encoded = np.array([CleanData.similar(str(value)) for value in uniques] + [''], dtype=object)
+        return pd.Series(encoded[codes], index=values.index)
+
+    OUTPUT_COLUMNS = [
+        'client_id',
+        'client_fio_full',
+        'client_fio_full_code',
+        'client_bday_code',
+        'client_snils_code',
+        'client_inn_code',
+        'contact_email_code',
+        'contact_phone',
+        'addr_str_code'
+    ]
+
+    ADDRESS_COLUMNS = [
+        'addr_region', 'addr_zip', 'addr_country', 'addr_body', 'addr_area', 'addr_loc',
+        'addr_reg_dt', 'addr_city', 'addr_street', 'addr_house', 'addr_flat'
+    ]
+
+    EMAIL_REGEX = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+    # Векторизованная очистка: каждый шаг работает над целыми столбцами
+    @staticmethod
+    def clean_df(df):
+        df = df.copy()
+        # Предварительно стандартизируем ФИО и создаем код 'fio'
+        CleanData.standardize_fio_columns(df)
+        df['client_fio_full_code'] = CleanData.similar_column(df['client_fio_full'])
+
+        # Чекаем дату рождения на формат
+        df['client_bday_code'] = CleanData.clean_date(df['client_bday'])
+
+        # Обрезаем дробную часть (у снилса и инн ага)
+        df['client_snils'] = df['client_snils'].astype(str).str[:-2]
+        df['client_inn'] = df['client_inn'].astype(str).str[:-2]
 
-            if index1 == 0 or index2 == 0:
-                differences += "0"
-                continue
+        # Чекаем валидность снилс и инн
+        snils_valid = df['client_snils'].str.replace(r'[ -]', '', regex=True).str.fullmatch(r'\d{11}', na=False)
+        df['client_snils_code'] = np.where(snils_valid, 1, np.where(df['client_snils'].notna(), 0, -1))
+        inn_valid = df['client_inn'].str.fullmatch(r'\d{10}|\d{12}', na=False)
+        df['client_inn_code'] = np.where(inn_valid, 1, np.where(df['client_inn'].notna(), 0, -1))
 
-            difference = abs(index1 - index2)
-            difference_base32 = format(difference, 'x')
+        # Простая проверка регуляркой
+        df['contact_email_code'] = CleanData.assign_email_codes(df['contact_email'])
 
-            if difference < 32:
-                differences += difference_base32
-            else:
-                chars = "0123456789abcdefghijklmnopqrstuvwxyz"
-                base32_str = ''
-                while difference:
-                    difference, rem = divmod(difference, 32)
-                    base32_str = chars[rem] + base32_str
-                differences += base32_str
+        # ПЕРЕЗАПИСЫВАЕМ в в стандартном формате
+        df['contact_phone'] = CleanData.standardize_phones(df['contact_phone'])
+
+        # Проверяем, соответствует ли строка адреса ее сборной версии из других столбцов.
+        # ожно будет перезаписать наиболее полным вариантом
+        df['addr_str_code'] = CleanData.compare_addresses_columns(df)
 
-        return differences
+        df = df[CleanData.OUTPUT_COLUMNS]
+
+        return df
 
     @staticmethod
-    def clean_df(df):
-        df = df.head(1000).copy()
+    def standardize_fio_columns(df):
+        first = df['client_first_name']
+        middle = df['client_middle_name']
+        last = df['client_last_name']
+
+        # Если все три поля заполнены, создаем FIO
+        full_mask = first.notna() & middle.notna() & last.notna()
+        df['client_fio_full'] = df['client_fio_full'].astype(object)
+        df.loc[full_mask, 'client_fio_full'] = (
+            first[full_mask].astype(str) + ' ' + middle[full_mask].astype(str) + ' ' + last[full_mask].astype(str)
+        )
+
+        # Иначе раскладываем заполненное полное ФИО на части
+        split_mask = ~full_mask & df['client_fio_full'].notna()
+        parts = df.loc[split_mask, 'client_fio_full'].astype(str).str.split()
+        parts_count = parts.str.len()
+        three = parts_count >= 3
+        two = parts_count == 2
+        for column in ['client_first_name', 'client_middle_name', 'client_last_name']:
+            df[column] = df[column].astype(object)
+        df.loc[three[three].index, 'client_first_name'] = parts[three].str[0]
+        df.loc[three[three].index, 'client_middle_name'] = parts[three].str[1]
+        df.loc[three[three].index, 'client_last_name'] = parts[three].str[2]
+        df.loc[two[two].index, 'client_first_name'] = parts[two].str[0]
+        df.loc[two[two].index, 'client_last_name'] = parts[two].str[1]
+
+    @staticmethod
+    def assign_email_codes(emails):
+        codes = pd.Series(0, index=emails.index, dtype=object)  # Если значение NaN - 0
+        # astype('string'): у пустого столбца (все NaN) dtype float64, и .str на нем недоступен
+        valid = emails.astype('string').str.fullmatch(CleanData.EMAIL_REGEX, na=False).astype(bool)
+        codes[valid] = 1
+        invalid = emails.notna() & ~valid
+        codes[invalid] = CleanData.similar_column(emails[invalid])
+
+        return codes
+
+    @staticmethod
+    def standardize_phones(phones):
+        # Удаляем все символы, кроме цифр
+        digits = phones.astype(str).str.replace(r'\D', '', regex=True)
+        length = digits.str.len()
+
+        result = pd.Series(np.nan, index=phones.index, dtype=object)
+        ten = length == 10
+        result[ten] = '8' + digits[ten]  # Добавляем 8, если 10 цифр
+        seven = (length == 11) & digits.str.startswith('7')
+        result[seven] = '8' + digits[seven].str[1:]  # Заменяем 7 на 8
+        other = (length == 11) & ~seven
+        result[other] = digits[other]
+
+        return result
+
+    # Векторизованный compare_addresses: части адреса и addr_str разворачиваются
+    # в пары (строка, фрагмент), и проверяется вхождение каждой пары
+    @staticmethod
+    def compare_addresses_columns(df):
+        parts = df[CleanData.ADDRESS_COLUMNS].reset_index(drop=True)
+        parts = parts.astype(str).where(parts.notna(), '').stack()
+        parts = parts[parts != '']
+        tokens = parts.str.split(',').explode().str.strip()
+        tokens.index = tokens.index.get_level_values(0)
+
+        # Если ни одной части нет, собранный адрес - пустая строка
+        empty_rows = pd.RangeIndex(len(df)).difference(tokens.index.unique())
+        tokens = pd.concat([tokens, pd.Series('', index=empty_rows, dtype=object)])
+
+        addr = df['addr_str'].reset_index(drop=True)
+        addr = addr.where(addr.notna(), '').astype(str)
+        addr_tokens = addr.str.split(',').explode().str.strip()
+        addr_pairs = pd.MultiIndex.from_arrays([addr_tokens.index, addr_tokens.to_numpy()])
+
+        found = pd.MultiIndex.from_arrays([tokens.index, tokens.to_numpy()]).isin(addr_pairs)
+        result = pd.Series(found, index=tokens.index).groupby(level=0).all()
+
+        return result.reindex(pd.RangeIndex(len(df))).to_numpy()
+
+    # DataFrame для воркеров clean_df_parallel. При запуске через fork процессы получают его
+    # из памяти родителя (copy-on-write), по каналу передаются только границы кусков
+    shared_df = None
+
+    @staticmethod
+    def clean_chunk(bounds):
+        start, stop = bounds
+        return CleanData.clean_df(CleanData.shared_df.iloc[start:stop])
+
+    # Параллельная очистка: DataFrame режется на куски строк, куски чистятся в пуле процессов
+    # и склеиваются в исходном порядке, поэтому результат совпадает с clean_df
+    @staticmethod
+    def clean_df_parallel(df, workers=None, chunk_size=None):
+        workers = workers or os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(df) // (workers * 4)))
+        bounds = [(start, min(start + chunk_size, len(df))) for start in range(0, len(df), chunk_size)]
+        if len(bounds) < 2 or workers == 1:
+            return CleanData.clean_df(df)
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            CleanData.shared_df = df
+            try:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    chunks = pool.map(CleanData.clean_chunk, bounds)
+            finally:
+                CleanData.shared_df = None
+        else:
+            # Без fork (Windows) кускам приходится ехать к процессам сериализованными
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                chunks = pool.map(CleanData.clean_df, [df.iloc[start:stop] for start, stop in bounds])
+
+        return pd.concat(chunks)
+
+    # Прежняя построчная версия clean_df, оставлена для сравнения в Benchmark.py
+    @staticmethod
+    def clean_df_rowwise(df):
+        df = df.copy()
         # Предварительно стандартизируем ФИО и создаем код 'fio'
         df[['client_fio_full', 'client_fio_full_code']] = df.apply(
             lambda row: (
@@ -51,7 +241,7 @@ class CleanData:
         )
 
         # Чекаем дату рождения на формат
-        df['client_bday_code'] = CleanData.clean_date(df['client_bday'])
+        df['client_bday_code'] = CleanData.clean_date_rowwise(df['client_bday'])
 
         # Обрезаем дробную часть (у снилса и инн ага)
         df['client_snils'] = df['client_snils'].astype(str).str[:-2]
@@ -75,19 +265,7 @@ class CleanData:
         # ожно будет перезаписать наиболее полным вариантом
         df['addr_str_code'] = df.apply(CleanData.compare_addresses, axis=1)
 
-        new_columns = [
-            'client_id',
-            'client_fio_full',
-            'client_fio_full_code',
-            'client_bday_code',
-            'client_snils_code',
-            'client_inn_code',
-            'contact_email_code',
-            'contact_phone',
-            'addr_str_code'
-        ]
-
-        df = df[new_columns]
+        df = df[CleanData.OUTPUT_COLUMNS]
 
         return df
 
@@ -125,6 +303,8 @@ class CleanData:
 
     @staticmethod
     def standardize_phone(phone):
+        if not isinstance(phone, str):
+            return np.nan
         # Удаляем все символы, кроме цифр
         cleaned_phone = ''.join(filter(str.isdigit, phone))
 
@@ -163,6 +343,22 @@ class CleanData:
 
     @staticmethod
     def clean_date(birth_dates):
+        current_year = datetime.now().year
+        dates = pd.to_datetime(birth_dates, errors='coerce')
+        # Значения в другом формате, чем большинство, разбираем по одному
+        retry = dates.isna() & birth_dates.notna()
+        if retry.any():
+            dates[retry] = pd.to_datetime(birth_dates[retry], errors='coerce', format='mixed')
+
+        # 0 - подозрительная дата (человек более 130 лет), 1 - реалистичная дата
+        codes = np.where(current_year - dates.dt.year > 130, 0, 1)
+        # Формат не соответствует дате
+        codes[(dates.isna() & birth_dates.notna()).to_numpy()] = -1
+
+        return codes
+
+    @staticmethod
+    def clean_date_rowwise(birth_dates):
         current_year = datetime.now().year
         standardized_codes = []
 
@@ -204,4 +400,7 @@ class CleanData:
                 row['client_last_name'] = fio_parts[1]
 
         # Возвращаем обновленную строку
-        return row
\ No newline at end of file
+        return row
+
+
+SIMILAR_TABLE = TranslationTable(CleanData.similar_char)
\ No newline at end of file
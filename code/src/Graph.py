@@ -3,7 +3,6 @@
 # value - значение свойства
 # trusted_coefficient - уровень доверия свойства
 import random
-import MergeWizard
 
 
 class Property:
@@ -48,27 +47,55 @@ class Vertex:
 
 
 # Гиперребро
-# vertices - множество вершин, ассоцииарованных с ребром
+# vertices - вершины, ассоцииарованные с ребром (словарь имя -> вершина, порядок добавления сохраняется)
 # agr_weight - агрегатный вес ребра
 # mark - отметка, обозначающая что-нибудь (например, текущий статус гиперребра)
+# edges - внутренние ребра (оба конца в гиперребре), по ним ведутся сумма и максимум весов
 class Hyperedge:
     def __init__(self, name, vertices, agr_weight = 0, mark = 0):
         self.name = name
-        self.vertices = vertices
+        self.vertices = {}
+        self.fill(vertices)
         self.agr_weight = agr_weight
         self.mark = mark
+        self.edges = set()
+        self.weight_sum = 0
+        # None - максимум устарел (удалено ребро с максимальным весом), пересчитается по запросу
+        self.max_weight = 0
 
     def fill(self, vertices):
-        self.vertices = vertices
+        self.vertices = {vertex.name: vertex for vertex in vertices}
 
     def add_vertex(self, vertex: Vertex):
-        self.vertices.append(vertex)
+        self.vertices[vertex.name] = vertex
 
     def delete_vertex(self, vertex: Vertex):
-        for vertex in list(self.vertices):
-            if vertex.name == vertex.name:
-                self.vertices.remove(vertex)
-                break
+        self.vertices.pop(vertex.name, None)
+
+    def add_internal_edge(self, edge):
+        if edge in self.edges:
+            return
+        self.edges.add(edge)
+        self.weight_sum += edge.weight
+        if self.max_weight is not None and edge.weight > self.max_weight:
+            self.max_weight = edge.weight
+
+    def remove_internal_edge(self, edge):
+        if edge not in self.edges:
+            return
+        self.edges.remove(edge)
+        self.weight_sum -= edge.weight
+        if self.max_weight is not None and edge.weight >= self.max_weight:
+            self.max_weight = None
+
+    # Средний вес внутренних ребер за O(1)
+    def get_agr_weight(self):
+        return self.weight_sum / len(self.edges) if self.edges else 0
+
+    def get_max_weight(self):
+        if self.max_weight is None:
+            self.max_weight = max((edge.weight for edge in self.edges), default=0)
+        return self.max_weight
 
 
 # Ребро
@@ -94,14 +121,24 @@ class Edge:
 
 
 # Основной класс комбинированного графа, включающего в себя как традиционный взвешенный граф, так и гиперграф
-# vertices - общий для обоих подграфов набор вершин
+# vertices - общий для обоих подграфов набор вершин (словарь имя -> вершина)
 # hyperedges - массив гиперребер гиперграфа
-# edges - массив ребер традиционного графа
+# edges - ребра традиционного графа (словарь ключ пары имен -> ребро, по одному ребру на пару)
+# incidence - индекс инцидентности: имя вершины -> множество ее гиперребер
 class CombinedGraph:
+    # Допустимое превышение максимального веса внутреннего ребра над весом гиперребра
+    ANOMALY_THRESHOLD = 1
+
     def __init__(self):
-        self.vertices = []
+        self.vertices = {}
         self.hyperedges = []
-        self.edges = []
+        self.edges = {}
+        self.incidence = {}
+
+    # Ключ неупорядоченной пары вершин: ребра a-b и b-a совпадают
+    @staticmethod
+    def edge_key(name1, name2):
+        return (name1, name2) if name1 <= name2 else (name2, name1)
 
     def get_state(self):
         return {
@@ -111,75 +148,145 @@ class CombinedGraph:
         }
 
     def fill_edges(self, edges):
-        self.edges = []
-        self.edges.extend(edges)
+        self.edges = {}
         for edge in edges:
-            if edge.vertex1 in self.vertices:
-                self.vertices[self.vertices.index(edge.vertex1)].edges.add(edge)
-            if edge.vertex2 in self.vertices:
-                self.vertices[self.vertices.index(edge.vertex2)].edges.add(edge)
-
+            self.edges[CombinedGraph.edge_key(edge.vertex1.name, edge.vertex2.name)] = edge
+            if edge.vertex1.name in self.vertices:
+                self.vertices[edge.vertex1.name].edges.add(edge)
+            if edge.vertex2.name in self.vertices:
+                self.vertices[edge.vertex2.name].edges.add(edge)
+        for hyperedge in self.hyperedges:
+            hyperedge.edges = set()
+            hyperedge.weight_sum = 0
+            hyperedge.max_weight = 0
+        for edge in self.edges.values():
+            self.link_edge(edge)
 
     def fill_hyperedges(self, hyperedges):
         self.hyperedges = []
-        self.hyperedges.extend(hyperedges)
+        self.incidence = {}
+        for hyperedge in hyperedges:
+            self.register_hyperedge(hyperedge)
 
     def fill_vertices(self, vertices):
-        self.vertices = vertices
+        self.vertices = {vertex.name: vertex for vertex in vertices}
 
     def add_vertex(self, vertex):
-        self.vertices.append(vertex)
+        self.vertices[vertex.name] = vertex
 
+    # Вершина убирается и из всех своих гиперребер (с поправкой их агрегатов)
     def remove_vertex(self, vertex_name):
-        for vertex in list(self.vertices):
-            if vertex.name == vertex_name:
-                self.vertices.remove(vertex)
-                break
+        for hyperedge in list(self.incidence.get(vertex_name, ())):
+            self.remove_vertex_from_hyperedge(vertex_name, hyperedge)
+        self.incidence.pop(vertex_name, None)
+        self.vertices.pop(vertex_name, None)
+
+    def get_vertex(self, vertex_name):
+        return self.vertices.get(vertex_name)
 
     def remove_vertex_from_hyperedge(self, vertex_name, hyperedge: Hyperedge):
-        vertex_to_remove = None
-        for vertex in hyperedge.vertices:
-            if vertex.name == vertex_name:
-                vertex_to_remove = vertex
-                break
+        vertex_to_remove = hyperedge.vertices.get(vertex_name)
         if vertex_to_remove:
+            # Ребра вершины внутри гиперребра перестают быть внутренними
+            for edge in vertex_to_remove.edges:
+                hyperedge.remove_internal_edge(edge)
             hyperedge.delete_vertex(vertex_to_remove)
+            hyperedges = self.incidence.get(vertex_name)
+            if hyperedges is not None:
+                hyperedges.discard(hyperedge)
+                if not hyperedges:
+                    del self.incidence[vertex_name]
 
     def add_vertex_to_hyperedge(self, vertex: Vertex, hyperedge: Hyperedge):
         hyperedge.add_vertex(vertex)
+        self.incidence.setdefault(vertex.name, set()).add(hyperedge)
+        for edge in vertex.edges:
+            if hyperedge in self.get_edge_hyperedges(edge):
+                hyperedge.add_internal_edge(edge)
 
-    def add_edge(self, edge):
-        self.edges.append(edge)
+    # Гиперребра, для которых ребро внутреннее (оба конца - их вершины)
+    def get_edge_hyperedges(self, edge):
+        return self.incidence.get(edge.vertex1.name, set()) & self.incidence.get(edge.vertex2.name, set())
+
+    def link_edge(self, edge):
+        for hyperedge in self.get_edge_hyperedges(edge):
+            hyperedge.add_internal_edge(edge)
+
+    def unlink_edge(self, edge):
+        for hyperedge in self.get_edge_hyperedges(edge):
+            hyperedge.remove_internal_edge(edge)
+
+    def get_edge(self, vertex_name1, vertex_name2):
+        return self.edges.get(CombinedGraph.edge_key(vertex_name1, vertex_name2))
+
+    def has_edge(self, edge):
+        return self.get_edge(edge.vertex1.name, edge.vertex2.name) is edge
 
+    # Новое ребро между той же парой вершин заменяет старое
+    def add_edge(self, edge):
+        old_edge = self.get_edge(edge.vertex1.name, edge.vertex2.name)
+        if old_edge is not None:
+            self.remove_edge(old_edge)
+        self.edges[CombinedGraph.edge_key(edge.vertex1.name, edge.vertex2.name)] = edge
+        edge.vertex1.add_edge(edge)
+        edge.vertex2.add_edge(edge)
+        self.link_edge(edge)
+
+    # Удаляет ребро между вершинами other_edge (сравнение по именам, как раньше)
     def remove_edge(self, other_edge):
-        for edge in list(self.edges):
-            if ((edge.vertex1.name == other_edge.vertex1.name and edge.vertex2.name == other_edge.vertex2.name) or
-                (edge.vertex1.name == other_edge.vertex2.name and edge.vertex2.name == other_edge.vertex1.name)):
-                self.edges.remove(edge)
-                break
+        edge = self.edges.pop(CombinedGraph.edge_key(other_edge.vertex1.name, other_edge.vertex2.name), None)
+        if edge is not None:
+            edge.vertex1.edges.discard(edge)
+            edge.vertex2.edges.discard(edge)
+            self.unlink_edge(edge)
+
+    # Изменение веса ребра с поправкой агрегатов его гиперребер
+    def update_edge_weight(self, edge, weight):
+        hyperedges = self.get_edge_hyperedges(edge)
+        for hyperedge in hyperedges:
+            hyperedge.remove_internal_edge(edge)
+        edge.weight = weight
+        for hyperedge in hyperedges:
+            hyperedge.add_internal_edge(edge)
+
+    # Заносит гиперребро в индекс инцидентности и собирает его внутренние ребра
+    def register_hyperedge(self, hyperedge: Hyperedge):
+        self.hyperedges.append(hyperedge)
+        hyperedge.edges = set()
+        hyperedge.weight_sum = 0
+        hyperedge.max_weight = 0
+        for name in hyperedge.vertices:
+            self.incidence.setdefault(name, set()).add(hyperedge)
+        for vertex in hyperedge.vertices.values():
+            for edge in vertex.edges:
+                if edge.vertex1.name in hyperedge.vertices and edge.vertex2.name in hyperedge.vertices:
+                    hyperedge.add_internal_edge(edge)
 
     def add_hyperedge(self, hyperedge: Hyperedge):
-        if all(vertex in self.vertices for vertex in hyperedge):
-            self.hyperedges.append(hyperedge)
+        if all(name in self.vertices for name in hyperedge.vertices):
+            self.register_hyperedge(hyperedge)
         else:
             print("Ошибка: Все вершины гиперребра должны существовать в гиперграфе.")
 
     def get_edges_connected_to_vertices(self, vertices):
-        # Получаем все ребра, которые соединяют указанные вершины
-        return [edge for edge in self.edges if (edge.vertex1 in vertices and edge.vertex2 in vertices)]
+        # Получаем все ребра, которые соединяют указанные вершины (обходим только их ребра)
+        names = {vertex.name for vertex in vertices}
+        edges = {edge for vertex in vertices for edge in vertex.edges
+                 if edge.vertex1.name in names and edge.vertex2.name in names}
+        return [edge for edge in edges if self.has_edge(edge)]
+
+    def check_hyperedge(self, hyperedge: Hyperedge, N = None):
+        if N is None:
+            N = CombinedGraph.ANOMALY_THRESHOLD
 
-    def check_hyperedge(self, hyperedge: Hyperedge):
         # Получаем все уникальные вершины в гиперребре
         vertices = hyperedge.vertices
 
-        # Получаем все ребра, соединяющие вершины гиперребра
-        connected_edges = self.get_edges_connected_to_vertices(vertices)
-
-        # Определяем максимальный вес среди этих ребер
-        max_weight = max((edge.weight for edge in connected_edges), default=0)
+        # Максимальный вес внутренних ребер берем из агрегатов гиперребра
+        max_weight = hyperedge.get_max_weight()
 
         # Проверяем каждое ребро гиперребра на аномалии
-        for vertex in list(vertices):  # Преобразовываем в список для безопасного удаления
+        for vertex in list(vertices.values()):  # Преобразовываем в список для безопасного удаления
             anomaly_found = False
 
             # Проверяем вес гиперребра (которое нам нужно будет вычислить или предоставить)
@@ -190,24 +297,18 @@ class CombinedGraph:
                 anomaly_found = True
 
             if anomaly_found:
-                hyperedge.delete_vertex(vertex)  # Удаляем вершину из гиперребра
+                self.remove_vertex_from_hyperedge(vertex.name, hyperedge)  # Удаляем вершину из гиперребра
 
     def calculate_all_hyperedge_weights(self):
-        # Вычисляем агрегатные веса для всех гиперребер в графе
+        # Вычисляем агрегатные веса для всех гиперребер в графе по накопленным суммам
         for hyperedge in self.hyperedges:
-            connected_edges = self.get_edges_connected_to_vertices(hyperedge.vertices)
-
-            if connected_edges:
-                total_weight = sum(edge.weight for edge in connected_edges)
-                hyperedge.agr_weight = total_weight / len(connected_edges)
-            else:
-                hyperedge.agr_weight = 0  # Если нет соединяющих ребер, вес равен 0
+            hyperedge.agr_weight = hyperedge.get_agr_weight()  # Если нет соединяющих ребер, вес равен 0
 
     def get_vertices(self):
-        return self.vertices
+        return self.vertices.values()
 
     def get_edges(self):
-        return self.edges
+        return self.edges.values()
 
     def get_hyperedges(self):
         return self.hyperedges
@@ -224,7 +325,7 @@ class CombinedGraph:
         output += "\nГиперребра графа:\n"
         for he in self.get_hyperedges():
             output += "["
-            for v in he.vertices:
+            for v in he.vertices.values():
                 output += str(v.name) + " "
             output += "]\n"
 
@@ -233,11 +334,15 @@ class CombinedGraph:
     def get_subgraph_by_hyperedges(self):
         result = []
         for he in self.hyperedges:
-            result.append(Vertex(he.name, random.choice(he.vertices).properties))
+            result.append(Vertex(he.name, random.choice(list(he.vertices.values())).properties))
 
         return result
 
     def collapse_hyperedge(self, hyperedge):
-        vertex1 = hyperedge.vertices[0]
-        for vertex in hyperedge.vertices[1:]:
+        # Импорт здесь: MergeWizard сам импортирует Graph
+        import MergeWizard
+
+        members = list(hyperedge.vertices.values())
+        vertex1 = members[0]
+        for vertex in members[1:]:
             vertex1 = MergeWizard.MergeWizard.merge_pair_vertices(vertex1, vertex, self).vertex
\ No newline at end of file
@@ -1,75 +1,136 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from typing import Optional
 
+
+# Шаг истории слияния: новая вершина, исходные вершины,
+# созданные и удаленные ребра и гиперребро, в которое попала новая вершина
 class HistoryVertex:
-    def __init__(self, vertex: Vertex, prev_vertex_1: Optional[Vertex] = None,
-                 prev_vertex_2: Optional[Vertex] = None):
+    def __init__(self, vertex: 'Vertex', prev_vertex_1: Optional['Vertex'] = None,
+                 prev_vertex_2: Optional['Vertex'] = None, add_edges: list = None,
+                 prev_edges: list = None, hyperedge: 'Hyperedge' = None):
         self.vertex = vertex
         self.prev_vertex_1 = prev_vertex_1
         self.prev_vertex_2 = prev_vertex_2
+        self.add_edges = add_edges or []
+        self.prev_edges = prev_edges or []
+        self.hyperedge = hyperedge
+
+    # У вершин MultiGraph есть id, у вершин CombinedGraph - только name
+    @staticmethod
+    def vertex_key(vertex):
+        return getattr(vertex, 'id', getattr(vertex, 'name', None))
 
     def __str__(self):
-        return f'V: {self.vertex.id} V1: {self.prev_vertex_1.id} V2: {self.prev_vertex_2.id}'
-
-
-class HistoryManager:
-    def __init__(self, graph: MultiGraph):
-        self.graph = graph
-        self.base_state = copy.deepcopy(graph.get_state())
-        self.history: List[HistoryVertex] = []
-        self.current_step = -1
-
-    def return_to_base_state(self):
-        base_state_data = self.base_state
-        self.graph.vertices = {}
-        self.graph.edges = set()
-        for vertex in base_state_data['vertices']:
-            self.graph.add_vertex(vertex)
-        self.graph.edges.update(base_state_data['edges'])
-        self.current_step = -1
-
-    def write_step(self, vertex: HistoryVertex):
-        self.history.append(vertex)
-        self.current_step = len(self.history) - 1
-
-    def next_step(self):
-        if self.current_step >= len(self.history) - 1:
-            return
-        if self.current_step == -1:
-            self.current_step = 0
-        else:
-            self.current_step += 1
-        self.graph.add_vertex(self.history[self.current_step].vertex)
-        self.graph.remove_vertex(self.history[self.current_step].prev_vertex_1.id)
-        self.graph.remove_vertex(self.history[self.current_step].prev_vertex_2.id)
+        return (f'V: {HistoryVertex.vertex_key(self.vertex)} V1: {HistoryVertex.vertex_key(self.prev_vertex_1)} '
+                f'V2: {HistoryVertex.vertex_key(self.prev_vertex_2)}')
 
-    def prev_step(self):
-        if self.current_step < 0:
-            return
-        if self.current_step == 0:
-            self.return_to_base_state()
-            return
-        self.graph.remove_vertex(self.history[self.current_step].vertex.id)
-        self.graph.add_vertex(self.history[self.current_step].prev_vertex_1)
-        self.graph.add_vertex(self.history[self.current_step].prev_vertex_2)
 
-        self.current_step -= 1
+class GraphCommand:
+    MERGE_COM = 'MERGE'
+    SPLIT_COM = 'SPLIT'
 
 
+# Журнал команд графа. После setup_logging записи слияний кладутся в очередь как кортежи,
+# а строка собирается и пишется в файл фоновым потоком пачками. Записи модуля logging
+# попадают в ту же очередь через QueueHandler, так что файл открыт только у фонового потока.
+# sample_rate задает долю записываемых слияний: 1 - все, 0 - запись выключена
 class LogManager:
+    sample_rate = 1.0
+    batch_size = 1000
+    log_queue = None
+    writer = None
+    queue_handler = None
+
+    @staticmethod
+    def setup_logging(log_file='graph_commands.log', sample_rate=1.0, batch_size=1000):
+        LogManager.stop()
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+        LogManager.sample_rate = sample_rate
+        LogManager.batch_size = batch_size
+        LogManager.log_queue = queue.SimpleQueue()
+        LogManager.queue_handler = logging.handlers.QueueHandler(LogManager.log_queue)
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(LogManager.queue_handler)
+        LogManager.writer = threading.Thread(target=LogManager.write_loop, args=(LogManager.log_queue, file_handler, batch_size), daemon=True)
+        LogManager.writer.start()
+
+    # Дописывает оставшиеся записи и останавливает фоновый поток
+    @staticmethod
+    def stop():
+        if LogManager.writer is None:
+            return
+        logging.getLogger().removeHandler(LogManager.queue_handler)
+        LogManager.log_queue.put(None)
+        LogManager.writer.join()
+        LogManager.writer = None
+        LogManager.log_queue = None
+        LogManager.queue_handler = None
+
+    # Фоновый поток: единственный, кто пишет в файл. Кортежи LogManager собираются render,
+    # записи logging (LogRecord из QueueHandler) - форматтером file_handler
     @staticmethod
-    def setup_logging(log_file='graph_commands.log'):
-        logging.basicConfig(
-            filename=log_file,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+    def write_loop(log_queue, file_handler, batch_size):
+        try:
+            while True:
+                batch = [log_queue.get()]
+                while len(batch) < batch_size:
+                    try:
+                        batch.append(log_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                finished = None in batch
+                file_handler.stream.write(''.join(
+                    LogManager.render(record) if isinstance(record, tuple) else file_handler.format(record) + '\n'
+                    for record in batch if record is not None))
+                file_handler.flush()
+                if finished:
+                    return
+        finally:
+            file_handler.close()
+
+    @staticmethod
+    def format_time(timestamp):
+        if isinstance(timestamp, str):
+            return timestamp
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
 
     @staticmethod
-    def writeMerge(vertex1: Vertex, vertex2: Vertex, resultVertex: Vertex, datetime):
-        log_message = f"Command: {GraphCommand.MERGE_COM:<10} | V1: {vertex1.name:<10} | V2: {vertex2.name:<10} | New_V: {resultVertex.name:<10} | Time: {datetime}"
-        logging.info(log_message)
+    def format_message(record):
+        command, name1, name2, name3, timestamp = record
+        if command == GraphCommand.MERGE_COM:
+            return f"Command: {command:<10} | V1: {name1:<10} | V2: {name2:<10} | New_V: {name3:<10} | Time: {LogManager.format_time(timestamp)}"
+        return f"Command: {command:<10} | Base V: {name1:<10} | V1: {name2:<10} | V2: {name3:<10} | Time: {LogManager.format_time(timestamp)}"
 
+    # Строка в том же формате, что и у записей logging (форматтер из setup_logging)
     @staticmethod
-    def writeSplit(baseVertex: Vertex, vertex1: Vertex, vertex2: Vertex, datetime):
-        log_message = f"Command: {GraphCommand.SPLIT_COM:<10} | Base V: {baseVertex.name:<10} | V1: {vertex1.name:<10} | V2: {vertex2.name:<10} | Time: {datetime}"
-        logging.info(log_message)
\ No newline at end of file
+    def render(record):
+        return f'{LogManager.format_time(record[4])} - INFO - {LogManager.format_message(record)}\n'
+
+    @staticmethod
+    def write(record):
+        if LogManager.sample_rate < 1 and (LogManager.sample_rate <= 0 or random.random() >= LogManager.sample_rate):
+            return
+        if LogManager.log_queue is None:
+            logging.info(LogManager.format_message(record))
+        else:
+            LogManager.log_queue.put(record)
+
+    @staticmethod
+    def writeMerge(vertex1: 'Vertex', vertex2: 'Vertex', resultVertex: 'Vertex', datetime=None):
+        LogManager.write((GraphCommand.MERGE_COM, vertex1.name, vertex2.name, resultVertex.name, datetime or time.time()))
+
+    @staticmethod
+    def writeSplit(baseVertex: 'Vertex', vertex1: 'Vertex', vertex2: 'Vertex', datetime=None):
+        LogManager.write((GraphCommand.SPLIT_COM, baseVertex.name, vertex1.name, vertex2.name, datetime or time.time()))
+
+
+atexit.register(LogManager.stop)
\ No newline at end of file
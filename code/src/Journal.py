@@ -0,0 +1,157 @@
+import json
+import os
+import pickle
+import time
+from contextlib import contextmanager
+
+
+# Журнал слияний MultiGraph на диске: одна JSON-запись на строку, только дозапись.
+# Записи копятся в буфере и сбрасываются пачками, fsync - не чаще fsync_interval секунд.
+# Каждые snapshot_every операций сохраняется снимок графа, поэтому после падения
+# resume загружает последний снимок и проигрывает только хвост журнала после него.
+# Внутри batch (например, merge_clusters) снимок откладывается до конца пакета:
+# снимок посреди пакета содержал бы золотые записи еще не записанных в журнал кластеров
+class MergeJournal:
+    def __init__(self, path, fsync_interval = 1.0, batch_size = 1000, snapshot_every = 0):
+        self.path = path
+        self.snapshot_path = path + '.snapshot'
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self.graph = None
+        self.buffer = []
+        self.operations = 0
+        self.batch_depth = 0
+        self.snapshot_due = False
+        MergeJournal.repair(path)
+        self.file = open(path, 'ab')
+        self.last_sync = time.monotonic()
+
+    # Отрезает недописанную последнюю строку, оставшуюся после падения
+    @staticmethod
+    def repair(path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                block = min(65536, position)
+                file.seek(position - block)
+                data = file.read(block)
+                newline = data.rfind(b'\n')
+                if newline != -1:
+                    position = position - block + newline + 1
+                    break
+                position -= block
+            if position != end:
+                file.truncate(position)
+
+    # Подключает журнал к графу: дальше merge_vertex и collapse_hyperedges пишут в него сами
+    def attach(self, graph):
+        self.graph = graph
+        graph.journal = self
+
+    def write(self, record: dict):
+        self.buffer.append(record)
+        self.operations += 1
+        now = time.monotonic()
+        if len(self.buffer) >= self.batch_size or now - self.last_sync >= self.fsync_interval:
+            self.flush(sync=now - self.last_sync >= self.fsync_interval)
+        if self.snapshot_every and self.graph is not None and self.operations % self.snapshot_every == 0:
+            if self.batch_depth:
+                self.snapshot_due = True
+            else:
+                self.snapshot(self.graph)
+
+    # Пакет операций, между которыми граф не снимается; пакеты могут быть вложенными
+    @contextmanager
+    def batch(self):
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.snapshot_due:
+                self.snapshot_due = False
+                if self.graph is not None:
+                    self.snapshot(self.graph)
+
+    def write_merge(self, new_id, v1_id, v2_id, debug = False):
+        self.write({'op': 'merge', 'new': new_id, 'v1': v1_id, 'v2': v2_id, 'debug': debug})
+
+    def write_cluster(self, new_id, member_ids: list):
+        self.write({'op': 'cluster', 'new': new_id, 'members': member_ids})
+
+    # Новые участники гиперребер (collapse_hyperedges): пары [id гиперребра, id вершин]
+    def write_hyperedges(self, hyperedges: list):
+        self.write({'op': 'hyperedges', 'hyperedges': hyperedges})
+
+    def flush(self, sync = True):
+        if self.buffer:
+            self.file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.buffer).encode('utf-8'))
+            self.buffer.clear()
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+            self.last_sync = time.monotonic()
+
+    # Снимок графа вместе с позицией в журнале, с которой начинается хвост
+    def snapshot(self, graph):
+        self.flush()
+        offset = self.file.tell()
+        journal = graph.journal
+        graph.journal = None
+        try:
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'wb') as file:
+                pickle.dump((offset, graph), file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.snapshot_path)
+        finally:
+            graph.journal = journal
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        if self.graph is not None and self.graph.journal is self:
+            self.graph.journal = None
+
+    # Восстанавливает граф: последний снимок (или переданный исходный граф) + хвост журнала
+    @staticmethod
+    def resume(path, graph = None):
+        offset = 0
+        snapshot_path = path + '.snapshot'
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as file:
+                offset, graph = pickle.load(file)
+        if graph is None:
+            raise ValueError('Нет ни снимка графа, ни исходного графа для восстановления')
+
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break  # недописанная при падении строка
+                    MergeJournal.replay(graph, json.loads(line))
+
+        return graph
+
+    @staticmethod
+    def replay(graph, record: dict):
+        if record['op'] == 'hyperedges':
+            hyperedges = {hyperedge.id: hyperedge for hyperedge in graph.hyperedges}
+            for h_id, v_ids in record['hyperedges']:
+                hyperedges[h_id].v_ids = v_ids
+            return
+
+        # Новой вершине достается тот же id, что и при исходном слиянии
+        graph.vertex_ids.next_id = record['new']
+        if record['op'] == 'merge':
+            graph.merge_vertex(graph.vertices[record['v1']], graph.vertices[record['v2']], record['debug'])
+        elif record['op'] == 'cluster':
+            graph.merge_cluster_vertices([graph.vertices[v_id] for v_id in record['members']])
+        else:
+            raise ValueError(f'Неизвестная операция в журнале: {record["op"]}')
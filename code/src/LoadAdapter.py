@@ -1,27 +1,88 @@
 import csv
 import random
+import sys
+import time
 from MultiGraph import *
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 class LoadWizard:
     @staticmethod
-    def parse_csv(file_path, N = -1):
+    def parse_csv(file_path, N = -1, columnar = False):
         vertices_list = []
 
+        for chunk in LoadWizard.parse_csv_chunks(file_path, N=N, columnar=columnar):
+            vertices_list.extend(chunk)
+
+        return vertices_list
+
+    # Потоковое чтение CSV: отдает вершины пачками по chunk_size штук,
+    # поэтому в памяти одновременно держится только одна пачка.
+    # columnar=True складывает значения в общий PropertyStore вместо объектов Property
+    @staticmethod
+    def parse_csv_chunks(file_path, chunk_size = 10000, N = -1, columnar = False):
         with open(file_path, mode='r', encoding='utf-8') as csvfile:
             csv_reader = csv.reader(csvfile)
             headers = next(csv_reader)  # Пропустить заголовок
+            store = PropertyStore(headers) if columnar else None
             counter = 0
+            chunk = []
             for row in csv_reader:
                 if counter >= N and N != -1:  # Проверка, достигли ли мы N записей
                     break
                 counter += 1
-                properties_list = set()
-                for header, value in zip(headers, row):
-                    # Создаем объект Property и добавляем его в список
-                    properties_list.add(Property(name=header, value=value))
-                vertices_list.append(Vertex(str(counter), properties_list))
+                if store is not None:
+                    # Как zip в построчном режиме: лишние поля отбрасываются, недостающие - None
+                    if len(row) != len(headers):
+                        row = (row + [None] * len(headers))[:len(headers)]
+                    chunk.append(Vertex(str(counter), store=store, row=store.append_row(row)))
+                else:
+                    properties_list = set()
+                    for header, value in zip(headers, row):
+                        # Создаем объект Property и добавляем его в список
+                        properties_list.add(Property(name=header, value=value))
+                    chunk.append(Vertex(str(counter), properties_list))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
 
-        return vertices_list
+            if chunk:
+                yield chunk
+
+    # Пиковое потребление памяти процессом в МБ (None, если платформа не поддерживает)
+    @staticmethod
+    def peak_rss_mb():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В Linux ru_maxrss в килобайтах, в macOS - в байтах
+        if sys.platform == 'darwin':
+            return peak / (1024 * 1024)
+        return peak / 1024
+
+    @staticmethod
+    def print_load_stats(rows, start_time):
+        elapsed = time.time() - start_time
+        speed = rows / elapsed if elapsed > 0 else 0
+        peak = LoadWizard.peak_rss_mb()
+        peak_str = f'{peak:.1f} МБ' if peak is not None else 'н/д'
+        print(f'Загружено {rows} строк за {elapsed:.2f}с. ({speed:.0f} строк/с), пик памяти: {peak_str}')
+
+    # Загружает пачки вершин в граф по мере чтения файла
+    @staticmethod
+    def stream_to_graph(graph: MultiGraph, chunks, verbose = True):
+        start_time = time.time()
+        rows = 0
+        for chunk in chunks:
+            graph.add_vertices(chunk)
+            rows += len(chunk)
+            if verbose:
+                LoadWizard.print_load_stats(rows, start_time)
+
+        return rows
 
     @staticmethod
     def create_edges_and_hyperedges(graph: MultiGraph, num_edges_per_vertex: list, vertices_per_hyperedge: int):
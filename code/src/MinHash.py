@@ -0,0 +1,125 @@
+import zlib
+
+import numpy as np
+
+from MultiGraph import *
+
+
+# MinHash + LSH по символьным n-граммам одного свойства вершины (ФИО, адрес).
+# Сигнатура из num_perm минимумов делится на bands полос, вершины с совпавшей полосой
+# попадают в одну корзину и становятся кандидатами; сходство оценивается по доле
+# совпавших минимумов (оценка коэффициента Жаккара n-грамм)
+class MinHashIndex:
+    # Простое число меньше 2^32: (a * x + b) для 32-битных a, x, b не переполняет uint64,
+    # а результат помещается в uint32
+    PRIME = np.uint64(4294967291)
+
+    def __init__(self, property_name = 'client_fio_full', ngram = 3, num_perm = 64, bands = 16, seed = 1, max_bucket_size = None):
+        if num_perm % bands:
+            raise ValueError(f'num_perm ({num_perm}) должно делиться на bands ({bands})')
+
+        self.property_name = property_name
+        self.ngram = ngram
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # В больших корзинах кандидатами берутся только последние max_bucket_size вершин
+        self.max_bucket_size = max_bucket_size
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)[:, None]
+
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def shingles(self, text):
+        text = ' '.join(str(text).lower().split())
+        if not text:
+            return set()
+        text = f' {text} '
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    # crc32 вместо hash(): сигнатуры не зависят от PYTHONHASHSEED и совпадают между запусками
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), np.uint64, len(shingles))
+        return ((self.a * hashes + self.b) % MinHashIndex.PRIME).min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def similarity(self, signature1, signature2):
+        return float(np.count_nonzero(signature1 == signature2)) / self.num_perm
+
+    def text(self, vertex: Vertex):
+        value = vertex.get_property(self.property_name)
+        return value if isinstance(value, str) else None
+
+    # Похожие на text вершины индекса: id -> оценка Жаккара (не ниже min_similarity)
+    def query_text(self, text, min_similarity = 0.0, signature = None):
+        if signature is None:
+            signature = self.signature(text) if text is not None else None
+        if signature is None:
+            return {}
+
+        candidates = set()
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            ids = bucket.get(key)
+            if ids:
+                candidates.update(ids if self.max_bucket_size is None else ids[-self.max_bucket_size:])
+
+        result = {}
+        for other_id in candidates:
+            similarity = self.similarity(signature, self.signatures[other_id])
+            if similarity >= min_similarity:
+                result[other_id] = similarity
+
+        return result
+
+    def query(self, vertex: Vertex, min_similarity = 0.0):
+        result = self.query_text(self.text(vertex), min_similarity)
+        result.pop(vertex.id, None)
+        return result
+
+    # Добавляет вершину и возвращает похожие на нее из уже добавленных,
+    # так что при потоковой загрузке каждая пара находится ровно один раз
+    def add_vertex(self, vertex: Vertex, min_similarity = 0.0):
+        text = self.text(vertex)
+        signature = self.signature(text) if text is not None else None
+        if signature is None:
+            return {}
+
+        result = self.query_text(text, min_similarity, signature)
+        result.pop(vertex.id, None)
+
+        self.signatures[vertex.id] = signature
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            bucket.setdefault(key, []).append(vertex.id)
+
+        return result
+
+    def remove_vertex(self, vertex_id):
+        signature = self.signatures.pop(vertex_id, None)
+        if signature is None:
+            return
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            ids = bucket[key]
+            ids.remove(vertex_id)
+            if not ids:
+                del bucket[key]
+
+    # Индексирует вершины и добавляет в граф ребра с оценкой Жаккара как весом, возвращает число ребер
+    def add_edges(self, graph: MultiGraph, vertices = None, min_similarity = 0.5):
+        count = 0
+        for vertex in list(graph.vertices.values()) if vertices is None else vertices:
+            for other_id, similarity in self.add_vertex(vertex, min_similarity).items():
+                if other_id in graph.vertices:
+                    graph.add_edge(Edge(graph.edge_ids.allocate(), similarity, other_id, vertex.id))
+                    count += 1
+
+        return count
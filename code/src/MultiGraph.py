@@ -1,39 +1,292 @@
 import random
+from array import array
+from contextlib import nullcontext
+from functools import lru_cache
 from typing import Optional, List
-import copy
 from datetime import datetime
 
+import numpy as np
+
+from DisjointSet import DisjointSet
+
+# Общий пустой набор для вершин без ребер/гиперребер (сами наборы создаются лениво)
+_EMPTY = frozenset()
+
+# last_update -> номер дня. Даты у вершин сильно повторяются, поэтому разбор кэшируется
+@lru_cache(maxsize=None)
+def parse_update(last_update):
+    return datetime.strptime(last_update, '%Y-%m-%d').toordinal()
+
 class Property:
+    __slots__ = ('name', 'value', 'trusted_coefficient')
+
     def __init__(self, name = '', value = '', trusted_coefficient = 1):
         self.name = name
         self.value = value
         self.trusted_coefficient = trusted_coefficient
 
 class Edge:
+    __slots__ = ('id', 'weight', 'v1_id', 'v2_id')
+
     def __init__(self, id, weight, v1_id, v2_id):
         self.id = id
         self.weight = weight
         self.v1_id = v1_id
         self.v2_id = v2_id
 
+    # id ребер уникальны (их выдает IdAllocator графа), поэтому сравниваем по id
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
 class Hyperedge:
+    __slots__ = ('id', 'agr_weight', 'v_ids')
+
     def __init__(self, id, agr_weight, v_ids: list = None):
         self.id = id
         self.agr_weight = agr_weight
         self.v_ids = v_ids or []
 
+# Колоночное хранилище свойств: по одному списку значений на столбец
+# и параллельный массив коэффициентов доверия. Вершина, привязанная к хранилищу,
+# хранит только номер своей строки вместо набора объектов Property
+class PropertyStore:
+    def __init__(self, names):
+        self.names = list(names)
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.values = [[] for _ in self.names]
+        self.trust = [array('d') for _ in self.names]
+        self.size = 0
+
+    # Добавляет строки DataFrame целыми столбцами, возвращает номера новых строк
+    def extend_from_dataframe(self, df, trusted_coefficient = 1):
+        start = self.size
+        count = len(df)
+        for i, name in enumerate(self.names):
+            self.values[i].extend(df[name].tolist())
+            self.trust[i].extend(array('d', [trusted_coefficient]) * count)
+        self.size += count
+
+        return range(start, self.size)
+
+    def append_row(self, values, trust = None):
+        row = self.size
+        for i, value in enumerate(values):
+            self.values[i].append(value)
+            self.trust[i].append(1 if trust is None else trust[i])
+        self.size += 1
+
+        return row
+
+    # Добавляет строки целыми столбцами: values[i] и trust[i] - значения и доверие i-го столбца
+    def extend_columns(self, values, trust):
+        start = self.size
+        for i in range(len(self.names)):
+            self.values[i].extend(values[i])
+            self.trust[i].extend(trust[i])
+        self.size += len(values[0]) if values else 0
+
+        return range(start, self.size)
+
+    def get(self, row, name):
+        return self.values[self.columns[name]][row]
+
+    # Значения и доверие строки row по всем столбцам (в виде аргументов append_row)
+    def row_values(self, row):
+        return [column[row] for column in self.values], [column[row] for column in self.trust]
+
+    # Отбрасывает строки с номерами от size (например, при откате слияния в HistoryManager).
+    # Столбцы снимка (Snapshot.MappedColumn/MappedTrust) обрезают только строки, добавленные после загрузки
+    def truncate(self, size):
+        for values, trust in zip(self.values, self.trust):
+            for column in (values, trust):
+                if isinstance(column, (list, array)):
+                    del column[size:]
+                else:
+                    column.truncate(size)
+        self.size = size
+
+    # Коэффициенты доверия строк rows (массив numpy) i-го столбца.
+    # Столбцы снимка (Snapshot.MappedTrust) отдают их сами, без копирования всего столбца
+    def trust_rows(self, i, rows):
+        column = self.trust[i]
+        if isinstance(column, array):
+            return np.frombuffer(column, np.float64)[rows]
+        return column.take(rows)
+
+    def row_properties(self, row):
+        return {Property(name, self.values[i][row], self.trust[i][row]) for i, name in enumerate(self.names)}
+
+    # Выгрузка строк по столбцам (например, для pd.DataFrame(...))
+    def export_rows(self, rows):
+        return {name: [self.values[i][row] for row in rows] for i, name in enumerate(self.names)}
+
 class Vertex:
-    def __init__(self, id, properties: set = None, is_trusted = 0, completeness_coef = 0.0, last_update = '1900-01-01', edges: set = None, hyperedges: set = None):
+    __slots__ = ('id', 'store', 'row', '_properties', 'completeness_coef', 'is_trusted', 'last_update', '_adjacency', '_parallel', '_hyperedges')
+
+    def __init__(self, id, properties: set = None, is_trusted = 0, completeness_coef = 0.0, last_update = '1900-01-01', edges: set = None, hyperedges: set = None,
+                 store: PropertyStore = None, row = -1):
         self.id = id
-        self.properties = properties or set()
+        self.store = store
+        self.row = row
+        self._properties = properties or None
         self.completeness_coef = completeness_coef
         self.is_trusted = is_trusted
         self.last_update = last_update
-        self.edges = edges or set()
-        self.hyperedges = hyperedges or set()
-
+        self._adjacency = None
+        self._parallel = None
+        self.edges = edges
+        self._hyperedges = hyperedges or None
+
+    # Для вершин из PropertyStore объекты Property собираются только по запросу
+    @property
+    def properties(self):
+        if self.store is not None:
+            return self.store.row_properties(self.row)
+        return self._properties if self._properties is not None else _EMPTY
+
+    @properties.setter
+    def properties(self, properties: set):
+        self._properties = properties or None
+
+    # Ребра вершины хранятся в индексе смежности: id соседа -> ребро.
+    # Параллельные ребра к тому же соседу (например, от разных ключей блокировки и MinHash)
+    # лежат в отдельном словаре id соседа -> список ребер, который создается только при их появлении
+    @property
+    def edges(self):
+        if self._adjacency is None:
+            return _EMPTY
+        if self._parallel is None:
+            return self._adjacency.values()
+        return [*self._adjacency.values(), *(edge for edges in self._parallel.values() for edge in edges)]
+
+    @edges.setter
+    def edges(self, edges: set):
+        self._adjacency = None
+        self._parallel = None
+        for edge in edges or ():
+            self.add_edge(edge)
+
+    # Первое ребро к каждому соседу; все ребра к соседу отдает get_edges
+    @property
+    def adjacency(self):
+        return self._adjacency if self._adjacency is not None else {}
+
+    # Готовый индекс id соседа -> ребро (например, собранный из CSR снимка), parallel - параллельные ребра
+    def set_adjacency(self, adjacency: dict, parallel: dict = None):
+        self._adjacency = adjacency or None
+        self._parallel = parallel or None
+
+    @property
+    def hyperedges(self):
+        return self._hyperedges if self._hyperedges is not None else _EMPTY
+
+    @hyperedges.setter
+    def hyperedges(self, hyperedges: set):
+        self._hyperedges = hyperedges or None
+
+    def get_property(self, name, default = None):
+        if self.store is not None:
+            if name not in self.store.columns:
+                return default
+            return self.store.get(self.row, name)
+        for prop in self.properties:
+            if prop.name == name:
+                return prop.value
+        return default
+
+    def get_neighbour_id(self, edge: Edge):
+        return edge.v2_id if edge.v1_id == self.id else edge.v1_id
+
+    def get_edge(self, neighbour_id):
+        if self._adjacency is None:
+            return None
+        return self._adjacency.get(neighbour_id)
+
+    def get_edges(self, neighbour_id):
+        edge = self.get_edge(neighbour_id)
+        if edge is None:
+            return []
+        if self._parallel is None or neighbour_id not in self._parallel:
+            return [edge]
+        return [edge, *self._parallel[neighbour_id]]
+
+    # Новое ребро к уже связанному соседу не заменяет прежнее, а добавляется параллельным
     def add_edge(self, edge: Edge):
-        self.edges.add(edge)
+        if self._adjacency is None:
+            self._adjacency = {}
+        neighbour_id = self.get_neighbour_id(edge)
+        first = self._adjacency.setdefault(neighbour_id, edge)
+        if first is edge:
+            return
+        if self._parallel is None:
+            self._parallel = {}
+        edges = self._parallel.setdefault(neighbour_id, [])
+        if not any(other is edge for other in edges):
+            edges.append(edge)
+
+    def remove_edge(self, edge: Edge):
+        neighbour_id = self.get_neighbour_id(edge)
+        edges = self._parallel.get(neighbour_id) if self._parallel is not None else None
+        if self._adjacency[neighbour_id] is edge:
+            if edges:
+                # Первым становится следующее параллельное ребро
+                self._adjacency[neighbour_id] = edges.pop(0)
+            else:
+                del self._adjacency[neighbour_id]
+        else:
+            index = next((i for i, other in enumerate(edges or ()) if other is edge), None)
+            if index is None:
+                raise KeyError(edge.id)
+            del edges[index]
+        if edges is not None and not edges:
+            del self._parallel[neighbour_id]
+            if not self._parallel:
+                self._parallel = None
+        if not self._adjacency:
+            self._adjacency = None
+
+    def add_hyperedge(self, hyperedge: Hyperedge):
+        if self._hyperedges is None:
+            self._hyperedges = set()
+        self._hyperedges.add(hyperedge)
+
+    def remove_hyperedge(self, hyperedge: Hyperedge):
+        self._hyperedges.remove(hyperedge)
+        if not self._hyperedges:
+            self._hyperedges = None
+
+
+# Монотонный генератор целочисленных id для ребер и слитых вершин
+class IdAllocator:
+    __slots__ = ('next_id',)
+
+    def __init__(self, start = 1):
+        self.next_id = start
+
+    def allocate(self):
+        new_id = self.next_id
+        self.next_id += 1
+        return new_id
+
+    # Сдвигает счетчик за уже занятый id (например, client_id из файла),
+    # чтобы новые id с ним не пересекались
+    def reserve(self, used_id):
+        if isinstance(used_id, str):
+            if not used_id.isdigit():
+                return
+            used_id = int(used_id)
+        elif not isinstance(used_id, int):
+            return
+        if used_id >= self.next_id:
+            self.next_id = used_id + 1
+
+
+# Так выглядит вершина, полученная merge_vertex, для последующих сравнений свойств
+_MERGED_VERTEX = Vertex(None)
+_MERGED_DATE = parse_update(_MERGED_VERTEX.last_update)
 
 
 class MultiGraph:
@@ -41,9 +294,21 @@ class MultiGraph:
         self.vertices = {vertex.id: vertex for vertex in vertices} if vertices else {}
         self.edges = set()
         self.hyperedges = set()
+        self.vertex_ids = IdAllocator()
+        self.edge_ids = IdAllocator()
+        self.hyperedge_ids = IdAllocator()
+        # id слитой вершины -> id вершин, из которых она получена
+        self.lineage = {}
+        # Необязательный журнал слияний на диске (см. Journal.MergeJournal)
+        self.journal = None
         for vertex in self.vertices.values():
+            self.vertex_ids.reserve(vertex.id)
             self.edges.update(vertex.edges)
             self.hyperedges.update(vertex.hyperedges)
+        for edge in self.edges:
+            self.edge_ids.reserve(edge.id)
+        for hyperedge in self.hyperedges:
+            self.hyperedge_ids.reserve(hyperedge.id)
 
     def get_state(self):
         return {
@@ -52,87 +317,128 @@ class MultiGraph:
             'hyperedges': self.hyperedges
         }
 
+    # Ребро к уже связанной паре вершин добавляется параллельным, прежние ребра остаются
     def add_edge(self, edge: 'Edge'):
-        self.vertices[edge.v1_id].edges.add(edge)
-        self.vertices[edge.v2_id].edges.add(edge)
+        self.vertices[edge.v1_id].add_edge(edge)
+        self.vertices[edge.v2_id].add_edge(edge)
         self.edges.add(edge)
+        self.edge_ids.reserve(edge.id)
 
     def add_hyperedge(self, hyperedge: 'Hyperedge'):
         self.hyperedges.add(hyperedge)
+        self.hyperedge_ids.reserve(hyperedge.id)
         for vertex_id in hyperedge.v_ids:
             if vertex_id in self.vertices:
-                self.vertices[vertex_id].hyperedges.add(hyperedge)
+                self.vertices[vertex_id].add_hyperedge(hyperedge)
 
     def add_vertex(self, vertex: 'Vertex'):
         self.vertices[vertex.id] = vertex
+        self.vertex_ids.reserve(vertex.id)
         self.edges.update(vertex.edges)
 
+    # Пакетное добавление вершин (используется при потоковой загрузке)
+    def add_vertices(self, vertices):
+        for vertex in vertices:
+            self.vertices[vertex.id] = vertex
+            self.vertex_ids.reserve(vertex.id)
+            self.edges.update(vertex.edges)
+            self.hyperedges.update(vertex.hyperedges)
+
     def remove_vertex(self, v_id):
         if v_id in self.vertices:
             del self.vertices[v_id]
 
     def remove_edge(self, edge: 'Edge'):
-        self.vertices[edge.v1_id].edges.remove(edge)
-        self.vertices[edge.v2_id].edges.remove(edge)
+        self.vertices[edge.v1_id].remove_edge(edge)
+        self.vertices[edge.v2_id].remove_edge(edge)
+        self.edges.discard(edge)
+
+    # Исходные id вершин, из которых собрана вершина v_id (в порядке слияния)
+    def get_originals(self, v_id):
+        originals = []
+        stack = [v_id]
+        while stack:
+            current = stack.pop()
+            parents = self.lineage.get(current)
+            if parents is None:
+                originals.append(current)
+            else:
+                stack.extend(reversed(parents))
+
+        return originals
 
     def remove_hyperedge(self, hyperedge: 'Hyperedge'):
         for vertex in hyperedge.v_ids:
-            self.vertices[vertex].hyperedges.remove(hyperedge)
-
-    def get_same_vertex(self, edge1: 'Edge', edge2: 'Edge', v1: 'Vertex', v2: 'Vertex'):
-        if (edge1.v1_id == edge2.v1_id or edge1.v1_id == edge2.v2_id) and not(edge1.v1_id == v1.id or edge1.v1_id == v2.id):
-            return edge1.v1_id
-        elif (edge1.v2_id == edge2.v1_id or edge1.v2_id == edge2.v2_id) and not(edge1.v2_id == v1.id or edge1.v2_id == v2.id):
-            return edge1.v2_id
+            if vertex in self.vertices and hyperedge in self.vertices[vertex].hyperedges:
+                self.vertices[vertex].remove_hyperedge(hyperedge)
+        self.hyperedges.discard(hyperedge)
+
+    # Правило выбора значения свойства при слиянии двух вершин:
+    # 1 - берем значение v1, 2 - значение v2, 0 - пустое значение
+    def choose_property(self, trust1, trust2, v1: Vertex, v2: Vertex):
+        return MultiGraph.choose_by_keys(trust1, trust2, parse_update(v1.last_update), parse_update(v2.last_update),
+                                         v1.completeness_coef, v2.completeness_coef)
+
+    # То же правило по заранее посчитанным ключам вершин: номерам дней last_update
+    # (parse_update) и коэффициентам полноты
+    @staticmethod
+    def choose_by_keys(trust1, trust2, date1, date2, completeness1, completeness2):
+        if trust1 > trust2:
+            return 1
+        elif trust1 < trust2:
+            return 2
+        elif trust1 == 1 and trust2 == 1:
+            if date1 > date2:
+                return 1
+            elif date1 < date2:
+                return 2
+            elif completeness1 > completeness2:
+                return 1
+            else:
+                return 2
+        elif trust1 == -1 and trust2 == -1:
+            return 0
+        elif trust1 == 0 and trust2 == 0:
+            if completeness1 > completeness2:
+                return 1
+            else:
+                return 2
         else:
-            return -1
-
-    def get_different_vertex(self, edge, vertex):
-        vertexes = vertex.id.split("_")
-        for vertex in vertexes:
-            if vertex == edge.v1_id:
-                return edge.v2_id
-            if vertex == edge.v2_id:
-                return edge.v1_id
-
-        return -1
-
+            return random.choice([1, 2])
+
+    # Векторная версия choose_by_keys для массивов numpy (аргументы приводятся к общей форме)
+    @staticmethod
+    def choose_vector(trust1, trust2, date1, date2, completeness1, completeness2):
+        by_completeness = np.where(completeness1 > completeness2, 1, 2)
+        by_date = np.where(date1 > date2, 1, np.where(date1 < date2, 2, by_completeness))
+        conditions = [trust1 > trust2, trust1 < trust2, (trust1 == 1) & (trust2 == 1),
+                      (trust1 == -1) & (trust2 == -1), (trust1 == 0) & (trust2 == 0)]
+        choice = np.select(conditions, [1, 2, by_date, 0, by_completeness], default=-1).astype(np.int8)
+
+        # Случайный выбор (равное доверие вне -1, 0, 1) берет зерно из random, как и choose_by_keys
+        tie = choice < 0
+        if tie.any():
+            rng = np.random.default_rng(random.getrandbits(64))
+            choice[tie] = rng.integers(1, 3, int(np.count_nonzero(tie)))
+
+        return choice
+
+    # Пара вершин - частный случай кластера из двух
     def merge_properties(self, v1: Vertex, v2: Vertex):
-        new_properties = set()
-        v1_properties = sorted(list(v1.properties), key=lambda x: x.name)
-        v2_properties = sorted(list(v2.properties), key=lambda x: x.name)
-
-        for prop1, prop2 in zip(v1_properties, v2_properties):
-            if prop1.trusted_coefficient > prop2.trusted_coefficient:
-                new_properties.add(prop1)
-            elif prop1.trusted_coefficient < prop2.trusted_coefficient:
-                new_properties.add(prop2)
-            elif prop1.trusted_coefficient == 1 and prop2.trusted_coefficient == 1:
-                if datetime.strptime(v1.last_update, '%Y-%m-%d') > datetime.strptime(v2.last_update, '%Y-%m-%d'):
-                    new_properties.add(prop1)
-                elif datetime.strptime(v1.last_update, '%Y-%m-%d') < datetime.strptime(v2.last_update, '%Y-%m-%d'):
-                    new_properties.add(prop2)
-                elif v1.completeness_coef > v2.completeness_coef:
-                    new_properties.add(prop1)
-                else:
-                    new_properties.add(prop2)
-            elif prop1.trusted_coefficient == -1 and prop2.trusted_coefficient == -1:
-                new_properties.add(Property(prop1.name))
-            elif prop1.trusted_coefficient == 0 and prop2.trusted_coefficient == 0:
-                if v1.completeness_coef > v2.completeness_coef:
-                    new_properties.add(prop1)
-                else:
-                    new_properties.add(prop2)
-            else:
-                new_properties.add(random.choice([prop1, prop2]))
+        return self.merge_cluster_properties([v1, v2])
 
-        return new_properties
+    # То же, что merge_properties, но для вершин из одного PropertyStore:
+    # сравнение идет по столбцам хранилища, результат дописывается новой строкой
+    def merge_rows(self, v1: Vertex, v2: Vertex):
+        return self.merge_cluster_rows([v1, v2])
 
     def merge_vertex(self, v1: 'Vertex', v2: 'Vertex', debug = False):
-        new_id = f"{v1.id}_{v2.id}"
-        new_properties = self.merge_properties(v1, v2)
-
-        new_vertex = Vertex(new_id, new_properties)
+        new_id = self.vertex_ids.allocate()
+        self.lineage[new_id] = (v1.id, v2.id)
+        if v1.store is not None and v1.store is v2.store:
+            new_vertex = Vertex(new_id, store=v1.store, row=self.merge_rows(v1, v2))
+        else:
+            new_vertex = Vertex(new_id, self.merge_properties(v1, v2))
         self.add_vertex(new_vertex)
 
         remove_edges_1 = set()
@@ -141,37 +447,22 @@ class MultiGraph:
         add_edges = set()
 
         if debug:
-            # ищем повторы а заодно сливаем одинаковые ребра со средним весом
-            for edge1 in v1.edges:
-                flag = -1
-                sum = edge1.weight
-                for edge2 in v2.edges:
-                    edge2_instance = self.get_same_vertex(edge1, edge2, v1, v2)
-                    if edge2_instance != -1:
-                        sum += edge2.weight
-                        flag = edge2_instance
-                avg_weight = sum / 2
-                if flag != -1:
-                    new_edge = Edge(len(self.edges) + 1, avg_weight, new_id, flag)
-                    self.add_edge(new_edge)
-                    add_edges.add(new_edge)
-                else:
-                    solo_edges.add(edge1)
-
-            # пройдемся в обратном порядке но без слияния, просто ищем одиночные ребра
-            for edge1 in v2.edges:
-                flag = -1
-                for edge2 in v1.edges:
-                    edge2_instance = self.get_same_vertex(edge1, edge2, v1, v2)
-                    if edge2_instance != -1:
-                        flag = edge2_instance
-                if flag == -1:
-                    solo_edges.add(edge1)
-
-            for edge in solo_edges:
-                old_vertex = self.get_different_vertex(edge, new_vertex)
-                if old_vertex != -1:
-                    self.add_edge(Edge(len(self.edges) + 1, edge.weight, new_id, old_vertex))
+            # Общих соседей ищем по индексу смежности, а не попарным перебором ребер.
+            # Ребра к общему соседу усредняются попарно (i-е ребро v1 с i-м ребром v2),
+            # остальные переносятся как есть, ребра между самими v1 и v2 исчезают
+            for neighbour_id in v1.adjacency:
+                if neighbour_id == v1.id or neighbour_id == v2.id:
+                    continue
+                edges1 = v1.get_edges(neighbour_id)
+                edges2 = v2.get_edges(neighbour_id)
+                for edge1, edge2 in zip(edges1, edges2):
+                    add_edges.add(Edge(self.edge_ids.allocate(), (edge1.weight + edge2.weight) / 2, new_id, neighbour_id))
+                solo_edges.update(edges1[len(edges2):])
+
+            for neighbour_id in v2.adjacency:
+                if neighbour_id == v1.id or neighbour_id == v2.id:
+                    continue
+                solo_edges.update(v2.get_edges(neighbour_id)[len(v1.get_edges(neighbour_id)):])
 
             for edge in list(v1.edges):
                 remove_edges_1.add(edge)
@@ -181,11 +472,21 @@ class MultiGraph:
                 remove_edges_2.add(edge)
                 self.remove_edge(edge)
 
-        history_vertex = HistoryVertex(new_vertex, v1, v2, add_edges, remove_edges_1, remove_edges_2)
+            for edge in solo_edges:
+                old_vertex = v1.get_neighbour_id(edge) if edge in remove_edges_1 else v2.get_neighbour_id(edge)
+                add_edges.add(Edge(self.edge_ids.allocate(), edge.weight, new_id, old_vertex))
+
+            for edge in add_edges:
+                self.add_edge(edge)
+
+        history_vertex = HistoryVertex(new_vertex, v1, v2, add_edges, remove_edges_1, remove_edges_2, self.lineage[new_id])
 
         self.remove_vertex(v1.id)
         self.remove_vertex(v2.id)
 
+        if self.journal is not None:
+            self.journal.write_merge(new_id, v1.id, v2.id, debug)
+
         return history_vertex
 
     def __str__(self):
@@ -231,69 +532,269 @@ class MultiGraph:
             # Обновляем список вершин
             vertices_list = list(self.vertices.values())  # Обновляем список объектов Vertex
 
+    # Ключи сравнения вершин кластера: last_update разбирается один раз на вершину
+    @staticmethod
+    def cluster_keys(members: list):
+        return [parse_update(vertex.last_update) for vertex in members], [vertex.completeness_coef for vertex in members]
+
+    # Свойства золотой записи кластера за один проход по k вершинам.
+    # Результат совпадает с цепочкой попарных merge_vertex: после первого слияния
+    # промежуточная вершина имеет last_update и completeness_coef по умолчанию,
+    # поэтому дальше сравнение идет с ключами _MERGED_VERTEX
+    def merge_cluster_properties(self, members: list):
+        dates, completeness = MultiGraph.cluster_keys(members)
+        result = {prop.name: prop for prop in members[0].properties}
+        left_date, left_completeness = dates[0], completeness[0]
+        for i in range(1, len(members)):
+            for prop2 in members[i].properties:
+                prop1 = result.get(prop2.name)
+                if prop1 is None:
+                    continue
+                choice = MultiGraph.choose_by_keys(prop1.trusted_coefficient, prop2.trusted_coefficient,
+                                                   left_date, dates[i], left_completeness, completeness[i])
+                if choice == 2:
+                    result[prop2.name] = prop2
+                elif choice == 0:
+                    result[prop2.name] = Property(prop2.name)
+            left_date, left_completeness = _MERGED_DATE, _MERGED_VERTEX.completeness_coef
+
+        return set(result.values())
+
+    # То же для вершин из одного PropertyStore: столбец за столбцом, одна новая строка на кластер
+    def merge_cluster_rows(self, members: list):
+        store = members[0].store
+        rows = [vertex.row for vertex in members]
+        dates, completeness = MultiGraph.cluster_keys(members)
+        values = []
+        trust = []
+        for column, column_trust in zip(store.values, store.trust):
+            value = column[rows[0]]
+            value_trust = column_trust[rows[0]]
+            left_date, left_completeness = dates[0], completeness[0]
+            for i in range(1, len(members)):
+                choice = MultiGraph.choose_by_keys(value_trust, column_trust[rows[i]],
+                                                   left_date, dates[i], left_completeness, completeness[i])
+                if choice == 2:
+                    value = column[rows[i]]
+                    value_trust = column_trust[rows[i]]
+                elif choice == 0:
+                    value = ''
+                    value_trust = 1
+                left_date, left_completeness = _MERGED_DATE, _MERGED_VERTEX.completeness_coef
+            values.append(value)
+            trust.append(value_trust)
+
+        return store.append_row(values, trust)
+
+    # Золотые записи сразу многих кластеров одного PropertyStore, возвращает номера новых строк.
+    # Вершины всех кластеров лежат подряд, матрица доверия (вершины x столбцы) собирается один раз,
+    # и шаг свертки t обрабатывает t-ю вершину всех кластеров размера больше t по всем столбцам сразу
+    def merge_store_clusters(self, store: PropertyStore, clusters: list):
+        sizes = np.fromiter((len(members) for members in clusters), np.int64, len(clusters))
+        starts = np.zeros(len(clusters), np.int64)
+        np.cumsum(sizes[:-1], out=starts[1:])
+        members = [vertex for cluster in clusters for vertex in cluster]
+        rows = np.fromiter((vertex.row for vertex in members), np.int64, len(members))
+        dates = np.fromiter((parse_update(vertex.last_update) for vertex in members), np.int64, len(members))
+        completeness = np.fromiter((vertex.completeness_coef for vertex in members), np.float64, len(members))
+        trust = np.empty((len(members), len(store.names)))
+        for i in range(len(store.names)):
+            trust[:, i] = store.trust_rows(i, rows)
+
+        # Для каждого кластера и столбца: номер вершины-победителя (-1 - пустое значение) и ее доверие
+        winner = np.repeat(starts[:, None], len(store.names), axis=1)
+        value_trust = trust[starts]
+        left_dates = dates[starts]
+        left_completeness = completeness[starts]
+        for step in range(1, int(sizes.max(initial=1))):
+            active = np.flatnonzero(sizes > step)
+            slots = starts[active] + step
+            choice = MultiGraph.choose_vector(value_trust[active], trust[slots],
+                                              left_dates[active, None], dates[slots, None],
+                                              left_completeness[active, None], completeness[slots, None])
+            winner[active] = np.where(choice == 2, slots[:, None], np.where(choice == 0, -1, winner[active]))
+            value_trust[active] = np.where(choice == 2, trust[slots], np.where(choice == 0, 1.0, value_trust[active]))
+            if step == 1:
+                left_dates[:] = _MERGED_DATE
+                left_completeness[:] = _MERGED_VERTEX.completeness_coef
+
+        values = []
+        for i, column in enumerate(store.values):
+            winner_rows = np.where(winner[:, i] >= 0, rows[winner[:, i]], -1).tolist()
+            values.append([column[row] if row >= 0 else '' for row in winner_rows])
+
+        return store.extend_columns(values, value_trust.T.tolist())
+
+    # Слияние многих кластеров за один этап: clusters - списки id вершин.
+    # Кластеры из вершин одного PropertyStore сливаются векторно (merge_store_clusters),
+    # остальные - проходом merge_cluster_properties. Возвращает золотые записи в порядке clusters
+    # (кластер из одной вершины возвращает саму вершину)
+    def merge_clusters(self, clusters):
+        with self.journal_batch():
+            return self.merge_clusters_batch(clusters)
+
+    # Пакет журнала (MergeJournal.batch) или пустой контекст, если журнала нет
+    def journal_batch(self):
+        return self.journal.batch() if self.journal is not None else nullcontext()
+
+    def merge_clusters_batch(self, clusters):
+        clusters = [[self.vertices[v_id] for v_id in v_ids] for v_ids in clusters]
+
+        store_clusters = {}
+        for index, members in enumerate(clusters):
+            store = members[0].store
+            if len(members) > 1 and store is not None and all(vertex.store is store for vertex in members):
+                store_clusters.setdefault(id(store), (store, []))[1].append(index)
+        golden_rows = {}
+        for store, indices in store_clusters.values():
+            golden_rows.update(zip(indices, self.merge_store_clusters(store, [clusters[index] for index in indices])))
+
+        result = []
+        for index, members in enumerate(clusters):
+            if len(members) == 1:
+                result.append(members[0])
+                continue
+
+            new_id = self.vertex_ids.allocate()
+            self.lineage[new_id] = tuple(vertex.id for vertex in members)
+            if index in golden_rows:
+                new_vertex = Vertex(new_id, store=members[0].store, row=golden_rows[index])
+            else:
+                new_vertex = Vertex(new_id, self.merge_cluster_properties(members))
+
+            for vertex in members:
+                self.remove_vertex(vertex.id)
+            self.add_vertex(new_vertex)
+
+            if self.journal is not None:
+                self.journal.write_cluster(new_id, [vertex.id for vertex in members])
+            result.append(new_vertex)
+
+        return result
+
+    def merge_cluster(self, vertex_ids):
+        return self.merge_clusters([vertex_ids])[0]
+
+    # Сливает все вершины кластера в одну золотую запись (без промежуточных вершин)
+    def merge_cluster_vertices(self, members: list):
+        return self.merge_cluster([vertex.id for vertex in members])
+
+    # Сначала union-find собирает кластеры по всем гиперребрам (пересекающиеся
+    # гиперребра попадают в один кластер), затем все кластеры сливаются одним этапом
+    # Замена участников гиперребер на золотые записи тоже пишется в журнал
     def collapse_hyperedges(self):
+        with self.journal_batch():
+            self.collapse_hyperedges_batch()
+
+    def collapse_hyperedges_batch(self):
+        clusters = DisjointSet()
         for hyperedge in self.hyperedges:
-            new_vertex = self.vertices[hyperedge.v_ids[0]]
-            for v_id in hyperedge.v_ids[1:]:
-                new_vertex = self.merge_vertex(new_vertex, self.vertices[v_id]).vertex
-            hyperedge.v_ids = [new_vertex.id]
+            v_ids = [v_id for v_id in hyperedge.v_ids if v_id in self.vertices]
+            for v_id in v_ids:
+                clusters.add(v_id)
+                clusters.union(v_ids[0], v_id)
 
+        groups = clusters.groups()
+        golden = dict(zip(groups, self.merge_clusters(groups.values())))
 
+        rewritten = []
+        for hyperedge in self.hyperedges:
+            for v_id in hyperedge.v_ids:
+                if v_id in clusters.parent:
+                    hyperedge.v_ids = [golden[clusters.find(v_id)].id]
+                    rewritten.append([hyperedge.id, hyperedge.v_ids])
+                    break
+        if self.journal is not None and rewritten:
+            self.journal.write_hyperedges(rewritten)
+
+# Дельта одного слияния: новая вершина, исходные вершины, добавленные и удаленные ребра,
+# запись lineage новой вершины и строка золотой записи в PropertyStore (если вершина из хранилища).
+# Откат и повтор затрагивают только эти вершины и ребра, а не весь граф
 class HistoryVertex:
     def __init__(self, vertex: Vertex, prev_vertex_1: Optional[Vertex] = None,
                  prev_vertex_2: Optional[Vertex] = None, add_edges: set = None,
-                 prev_edges_1: set = None, prev_edges_2: set = None):
+                 prev_edges_1: set = None, prev_edges_2: set = None, lineage: tuple = None):
         self.vertex = vertex
-        #self.vertex.edges.update(add_edges)
         self.prev_vertex_1 = prev_vertex_1
-        self.prev_vertex_1.edges = prev_edges_1
         self.prev_vertex_2 = prev_vertex_2
-        self.prev_vertex_2.edges = prev_edges_2
+        self.add_edges = add_edges or set()
+        self.prev_edges_1 = prev_edges_1 or set()
+        self.prev_edges_2 = prev_edges_2 or set()
+        self.lineage = lineage
+        # Строка золотой записи, снятая из хранилища при откате (значения и доверие для append_row)
+        self.store_row = None
+
+    # Повторно применяет слияние к графу
+    def redo(self, graph: MultiGraph):
+        for edge in self.prev_edges_1 | self.prev_edges_2:
+            graph.remove_edge(edge)
+        graph.remove_vertex(self.prev_vertex_1.id)
+        graph.remove_vertex(self.prev_vertex_2.id)
+        if self.store_row is not None:
+            # Строка возвращается на прежний номер: более поздние шаги к этому моменту откатаны
+            self.vertex.store.append_row(*self.store_row)
+            self.store_row = None
+        graph.add_vertex(self.vertex)
+        if self.lineage is not None:
+            graph.lineage[self.vertex.id] = self.lineage
+        for edge in self.add_edges:
+            graph.add_edge(edge)
+
+    # Откатывает слияние. Строка золотой записи убирается из хранилища, только если она последняя:
+    # строки, добавленные позже мимо истории (например, merge_clusters), не затрагиваются
+    def undo(self, graph: MultiGraph):
+        for edge in self.add_edges:
+            graph.remove_edge(edge)
+        graph.remove_vertex(self.vertex.id)
+        graph.lineage.pop(self.vertex.id, None)
+        store = self.vertex.store
+        if store is not None and self.vertex.row == store.size - 1:
+            self.store_row = store.row_values(self.vertex.row)
+            store.truncate(self.vertex.row)
+        graph.add_vertex(self.prev_vertex_1)
+        graph.add_vertex(self.prev_vertex_2)
+        for edge in self.prev_edges_1 | self.prev_edges_2:
+            graph.add_edge(edge)
 
     def __str__(self):
         return f'V: {self.vertex.id} V1: {self.prev_vertex_1.id} V2: {self.prev_vertex_2.id}'
 
 
+# История хранит только дельты слияний; базовое состояние не копируется,
+# а восстанавливается откатом всех шагов
 class HistoryManager:
     def __init__(self, graph: MultiGraph):
         self.graph = graph
-        self.base_state = copy.deepcopy(graph.get_state())
         self.history: List[HistoryVertex] = []
         self.current_step = -1
 
     def return_to_base_state(self):
-        base_state_data = self.base_state
-        self.graph.vertices = {}
-        self.graph.edges = set()
-        for vertex in base_state_data['vertices'].values():
-            self.graph.add_vertex(vertex)
-        self.graph.edges.update(base_state_data['edges'])
-        self.current_step = -1
+        self.go_to(-1)
 
     def write_step(self, vertex: HistoryVertex):
+        # Запись после отката начинает новую ветку: отмененные шаги отбрасываются
+        del self.history[self.current_step + 1:]
         self.history.append(vertex)
         self.current_step = len(self.history) - 1
 
     def next_step(self):
         if self.current_step >= len(self.history) - 1:
             return
-        if self.current_step == -1:
-            self.current_step = 0
-        else:
-            self.current_step += 1
-        self.graph.add_vertex(self.history[self.current_step].vertex)
-        self.graph.remove_vertex(self.history[self.current_step].prev_vertex_1.id)
-        self.graph.remove_vertex(self.history[self.current_step].prev_vertex_2.id)
+        self.current_step += 1
+        self.history[self.current_step].redo(self.graph)
 
     def prev_step(self):
         if self.current_step < 0:
             return
-        if self.current_step == 0:
-            self.return_to_base_state()
-            return
-        print(f'Vertex {self.history[self.current_step].vertex.id} Edges {[edge for edge in self.history[self.current_step].vertex.edges]}')
-        self.graph.remove_vertex(self.history[self.current_step].vertex.id)
-        self.graph.add_vertex(self.history[self.current_step].prev_vertex_1)
-        self.graph.add_vertex(self.history[self.current_step].prev_vertex_2)
-
-        self.current_step -= 1
\ No newline at end of file
+        self.history[self.current_step].undo(self.graph)
+        self.current_step -= 1
+
+    # Переход к произвольному шагу: дельты между текущим и целевым шагом применяются по одной,
+    # поэтому время пропорционально расстоянию между шагами (и окрестностям затронутых вершин).
+    # Материализованных контрольных точек с переходом за O(1) нет
+    def go_to(self, step):
+        step = max(-1, min(step, len(self.history) - 1))
+        while self.current_step < step:
+            self.next_step()
+        while self.current_step > step:
+            self.prev_step()
@@ -0,0 +1,168 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# Профиль заполненности CSV за один проход по кускам: доля заполненных ячеек,
+# текстовый/числовой тип и максимальная длина значения по столбцам, полнота каждой строки.
+# Файл целиком в память не загружается: куски из pd.read_csv(chunksize=...) передаются в add_chunk
+class Profiler:
+    # Тип полноты в бинарной таблице: 4 байта на строку вместо записи JSON
+    COMPLETENESS_DTYPE = np.float32
+
+    def __init__(self, skip_rows = 0):
+        # Первые skip_rows строк не учитываются в max_numeric_length (как numeric_df[3:] в скриптах)
+        self.skip_rows = skip_rows
+        self.columns = None
+        self.total_records = 0
+        self.non_null = {}
+        self.is_text = {}
+        # Столбец был числовым во всех кусках / хотя бы в одном куске был дробным
+        self.is_numeric = {}
+        self.is_float = {}
+        self.max_length = {}
+        # Первое непустое значение столбца в порядке файла
+        self.first_value = {}
+        # Наибольшая длина строкового представления числа среди всех числовых столбцов
+        self.max_numeric_length = 0
+        # Позиция столбца, в котором первым (по строкам) встретился символ '@' - почта
+        self.at_column = None
+
+    # Учитывает кусок в профиле, возвращает полноту его строк (доля непустых ячеек)
+    def add_chunk(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            for column in self.columns:
+                self.non_null[column] = 0
+                self.is_text[column] = False
+                self.is_numeric[column] = True
+                self.is_float[column] = False
+                self.max_length[column] = 0
+
+        offset = self.total_records
+        self.total_records += len(chunk)
+        filled = chunk.notna()
+        counts = filled.sum()
+        text_columns = []
+        for column in self.columns:
+            series = chunk[column]
+            count = int(counts[column])
+            self.non_null[column] += count
+            numeric = pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+            self.is_numeric[column] &= numeric
+            self.is_float[column] |= pd.api.types.is_float_dtype(series.dtype)
+            if not count:
+                continue
+
+            if column not in self.first_value:
+                self.first_value[column] = series.loc[series.first_valid_index()]
+            if numeric:
+                # Длина str() считается только для уникальных значений
+                uniques = pd.unique(series.dropna().to_numpy())
+                self.max_length[column] = max(self.max_length[column], int(np.char.str_len(uniques.astype(str)).max()))
+            elif pd.api.types.infer_dtype(series, skipna=True) in ['string', 'mixed', 'mixed-integer']:
+                self.is_text[column] = True
+                text_columns.append(column)
+                self.max_length[column] = max(self.max_length[column], int(series.str.len().max()))
+
+        # Как max(len(str(x)) for x in numeric_df[skip:].values.flatten()): общий dtype столбцов, NaN -> 'nan'
+        numeric_values = chunk.select_dtypes(include=np.number).to_numpy()[max(0, self.skip_rows - offset):]
+        if numeric_values.size:
+            self.max_numeric_length = max(self.max_numeric_length, int(np.char.str_len(pd.unique(numeric_values.ravel()).astype(str)).max()))
+
+        if self.at_column is None and text_columns:
+            found = np.column_stack([chunk[column].str.contains('@', regex=False, na=False).to_numpy(bool) for column in text_columns])
+            rows = np.flatnonzero(found.any(axis=1))
+            if len(rows):
+                self.at_column = self.columns.index(text_columns[int(np.argmax(found[rows[0]]))])
+
+        return filled.sum(axis=1) / len(chunk.columns)
+
+    # Один проход по файлу. comp_path - куда потоково записать полноту строк (JSON-список записей
+    # {'Индекс': значение index_column, 'Полнота': доля}, как DataFrame.to_json(orient='records')),
+    # comp_npy_path - куда сохранить ее же бинарной таблицей (completeness_table)
+    def profile(self, path, chunksize = 100000, comp_path = None, index_column = 'client_id', comp_npy_path = None):
+        ids = []
+        values = []
+        comp_file = open(comp_path, 'w', encoding='utf-8') if comp_path is not None else None
+        try:
+            if comp_file is not None:
+                comp_file.write('[')
+            first = True
+            for chunk in pd.read_csv(path, index_col=None, chunksize=chunksize):
+                completeness = self.add_chunk(chunk)
+                if comp_npy_path is not None:
+                    ids.append(chunk[index_column].to_numpy())
+                    values.append(completeness.to_numpy(Profiler.COMPLETENESS_DTYPE))
+                if comp_file is not None and len(chunk):
+                    records = pd.DataFrame({'Индекс': chunk[index_column].to_numpy(), 'Полнота': completeness.to_numpy()})
+                    comp_file.write(('' if first else ',') + records.to_json(force_ascii=False, orient='records')[1:-1])
+                    first = False
+            if comp_file is not None:
+                comp_file.write(']')
+        finally:
+            if comp_file is not None:
+                comp_file.close()
+
+        if comp_npy_path is not None:
+            np.save(comp_npy_path, Profiler.completeness_table(np.concatenate(ids) if ids else [], np.concatenate(values) if values else []))
+
+        return self
+
+    # Полнота строк в бинарном виде: структурированный массив с полями id и completeness
+    # в порядке строк CSV, то есть с тем же номером строки, что и у вершины.
+    # Сохраняется в .npy, поэтому читается через np.load(mmap_mode='r') без разбора
+    @staticmethod
+    def completeness_table(ids, values):
+        ids = np.asarray(ids)
+        if ids.dtype == object:
+            ids = ids.astype(str)
+        table = np.empty(len(ids), dtype=[('id', ids.dtype), ('completeness', Profiler.COMPLETENESS_DTYPE)])
+        table['id'] = ids
+        table['completeness'] = values
+
+        return table
+
+    # Таблица полноты из comp.npy (отображается в память) или из comp.json (список записей)
+    @staticmethod
+    def read_completeness(path, mmap = True):
+        if str(path).endswith('.npy'):
+            return np.load(path, mmap_mode='r' if mmap else None)
+
+        with open(path, 'r', encoding='utf-8') as file:
+            records = pd.DataFrame(json.load(file), columns=['Индекс', 'Полнота'])
+        # Нечисловые значения становятся NaN и при привязке пропускаются
+        return Profiler.completeness_table(records['Индекс'].to_numpy(), pd.to_numeric(records['Полнота'], errors='coerce').to_numpy())
+
+    def fill_ratio(self, column):
+        return self.non_null[column] / self.total_records if self.total_records else 0.0
+
+    # Строковое представление первого непустого значения. Если столбец в каком-то куске
+    # был дробным, pandas при чтении целиком привел бы его к float
+    def first_value_text(self, column):
+        value = self.first_value[column]
+        if self.is_numeric[column] and self.is_float[column]:
+            value = float(value)
+        return str(value)
+
+    # Вес столбца для freq.json: процент заполненности, текстовые столбцы (кроме почты) * 0.8,
+    # числовые - с поправкой 0.9..1.1 по длине первого значения
+    def column_weight(self, column):
+        # np.round, а не round: как у round(np.float64) в исходном скрипте (74.905 -> 74.9)
+        percentage_filled = np.round(self.fill_ratio(column) * 100, 2)
+        if self.is_text[column] and not self.columns.index(column) == self.at_column:
+            percentage_filled *= 0.8
+        elif not self.is_text[column] and column in self.first_value:
+            percentage_filled *= np.interp(len(self.first_value_text(column)), (1, self.max_numeric_length), (0.9, 1.1))
+
+        return percentage_filled
+
+    # Содержимое freq.json: столбец -> вес строкой, у zero_columns вес 0
+    def freq(self, columns = None, zero_columns = ()):
+        return {column: f"{0}" if column in zero_columns else f"{self.column_weight(column)}"
+                for column in (self.columns if columns is None else columns)}
+
+    def write_freq(self, path, columns = None, zero_columns = ()):
+        with open(path, 'w') as outfile:
+            outfile.write(json.dumps(self.freq(columns, zero_columns), indent=4))
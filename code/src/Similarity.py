@@ -0,0 +1,211 @@
+import numpy as np
+
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
+
+
+# Построчный Джаро для закодированных строк (коды символов + длины).
+# Повторяет jaro_metric один в один, включая подсчет транспозиций.
+# Если установлена numba, функция компилируется и строки считаются параллельно (см. конец модуля)
+def jaro_rows_loop(codes1, lengths1, codes2, lengths2, result):
+    # Одна строка в codes2 - общий эталон для всех строк codes1
+    step2 = 0 if codes2.shape[0] == 1 else 1
+    for row in prange(codes1.shape[0]):
+        row2 = row * step2
+        len1 = lengths1[row]
+        len2 = lengths2[row2]
+        if len1 == 0 or len2 == 0:
+            result[row] = 0.0
+            continue
+
+        max_dist = max(len1, len2) // 2 - 1
+        match1 = np.full(len1, -1, np.int64)
+        match2 = np.full(len2, -1, np.int64)
+
+        matches = 0
+        for i in range(len1):
+            start = max(0, i - max_dist)
+            end = min(i + max_dist + 1, len2)
+            for j in range(start, end):
+                if codes2[row2, j] == codes1[row, i] and match2[j] == -1:
+                    matches += 1
+                    match1[i] = j
+                    match2[j] = i
+                    break
+
+        if matches == 0:
+            result[row] = 0.0
+            continue
+
+        transpositions = 0
+        for k in range(matches):
+            if match1[k] != match2[match1[k] if match1[k] >= 0 else len2 - 1]:
+                transpositions += 1
+        transpositions //= 2
+
+        result[row] = (matches / len1 + matches / len2 + (matches - transpositions) / matches) / 3.0
+
+
+class Similarity:
+    # Эталонная скалярная версия (бывшая tst.jaro_metric), с ней сверяются векторные
+    @staticmethod
+    def jaro_metric(S1, S2):
+        s1 = str(S1)
+        s2 = str(S2)
+        # Если одна из строк пустая, возвращаем 0
+        if not s1 or not s2:
+            return 0.0
+
+        # Определение максимального расстояния для сравнения символов
+        max_dist = max(len(s1), len(s2)) // 2 - 1
+
+        # Списки для хранения индексов совпавших символов
+        match_indices_s1 = [-1] * len(s1)
+        match_indices_s2 = [-1] * len(s2)
+
+        # Считаем количество совпадений
+        matches = 0
+        for i, char1 in enumerate(s1):
+            start = max(0, i - max_dist)
+            end = min(i + max_dist + 1, len(s2))
+            for j in range(start, end):
+                if s2[j] == char1 and match_indices_s2[j] == -1:
+                    matches += 1
+                    match_indices_s1[i] = j
+                    match_indices_s2[j] = i
+                    break
+
+        # Рассчитываем количество транспозиций
+        transpositions = sum(
+            1 for k in range(matches) if match_indices_s1[k] != match_indices_s2[match_indices_s1[k]]
+        )
+
+        # Деление числа транспозиций пополам
+        transpositions //= 2
+
+        # Вычисляем итоговый коэффициент Джаро
+        if matches == 0:
+            return 0.0
+        else:
+            return (
+                    matches / len(s1) +
+                    matches / len(s2) +
+                    (matches - transpositions) / matches
+            ) / 3.0
+
+    # Строки -> матрица кодов символов (n x max_len, int32) и вектор длин
+    @staticmethod
+    def encode(values):
+        # astype(str) дает то же, что str() для каждого значения (nan -> 'nan'), но без цикла Python
+        strings = np.asarray(values, dtype=object).astype(str)
+        if not len(strings):
+            return np.zeros((0, 1), np.int32), np.zeros(0, np.int64)
+
+        width = max(strings.dtype.itemsize // 4, 1)
+        codes = np.ascontiguousarray(strings).view(np.int32).reshape(len(strings), width)
+        lengths = np.char.str_len(strings).astype(np.int64)
+        return codes, lengths
+
+    # Векторный Джаро по всем строкам сразу (запасной вариант без numba): цикл идет
+    # по позициям символов, а не по строкам. codes2 из одной строки сравнивается со всеми строками codes1
+    @staticmethod
+    def jaro_rows_numpy(codes1, lengths1, codes2, lengths2):
+        n = codes1.shape[0]
+        width1 = codes1.shape[1]
+        width2 = codes2.shape[1]
+        lengths2 = np.broadcast_to(lengths2, (n,))
+        codes2 = np.broadcast_to(codes2, (n, width2))
+
+        max_dist = np.maximum(lengths1, lengths2) // 2 - 1
+        max_dist_all = int(max_dist.max(initial=0))
+        match1 = np.full((n, width1), -1, np.int64)
+        used2 = np.zeros((n, width2), bool)
+        matches = np.zeros(n, np.int64)
+
+        for i in range(width1):
+            active = i < lengths1
+            start = np.maximum(0, i - max_dist)
+            end = np.minimum(i + max_dist + 1, lengths2)
+            found = ~active
+            for j in range(max(0, i - max_dist_all), min(i + max_dist_all + 1, width2)):
+                hit = ~found & (j >= start) & (j < end) & ~used2[:, j] & (codes2[:, j] == codes1[:, i])
+                used2[:, j] |= hit
+                match1[hit, i] = j
+                found |= hit
+            matches += (found & active)
+
+        # Транспозиции как в jaro_metric: для k < matches совпавший символ s1 считается,
+        # если его позиция в s2 не равна k; несовпавший (индекс -1) сравнивается
+        # с последним элементом match_indices_s2 и считается, если последний символ s2 совпал
+        positions = np.arange(width1)
+        counted = positions < matches[:, None]
+        last_matched = used2[np.arange(n), np.maximum(lengths2 - 1, 0)] & (lengths2 > 0)
+        moved = ((match1 >= 0) & (match1 != positions) & counted).sum(axis=1)
+        unmatched = ((match1 == -1) & counted).sum(axis=1)
+        transpositions = (moved + np.where(last_matched, unmatched, 0)) // 2
+
+        safe = np.maximum(matches, 1)
+        result = (matches / np.maximum(lengths1, 1) + matches / np.maximum(lengths2, 1) + (matches - transpositions) / safe) / 3.0
+        return np.where(matches > 0, result, 0.0)
+
+    @staticmethod
+    def jaro_rows(codes1, lengths1, codes2, lengths2):
+        if numba is not None:
+            result = np.empty(codes1.shape[0], np.float64)
+            jaro_rows_loop(codes1, lengths1, codes2, lengths2, result)
+            return result
+        return Similarity.jaro_rows_numpy(codes1, lengths1, codes2, lengths2)
+
+    # Джаро каждого значения со строкой reference (как subset.apply(jaro_metric, args=(reference,)))
+    @staticmethod
+    def jaro_to_reference(values, reference):
+        codes1, lengths1 = Similarity.encode(values)
+        codes2, lengths2 = Similarity.encode([reference])
+        return Similarity.jaro_rows(codes1, lengths1, codes2, lengths2)
+
+    # Джаро для пар кандидатов: values1[i] сравнивается с values2[i]
+    @staticmethod
+    def jaro_pairs(values1, values2):
+        codes1, lengths1 = Similarity.encode(values1)
+        codes2, lengths2 = Similarity.encode(values2)
+        if codes2.shape[0] == 1 and codes1.shape[0] != 1:
+            # Одна пара не должна приниматься за общий эталон
+            codes2 = np.repeat(codes2, codes1.shape[0], axis=0)
+            lengths2 = np.repeat(lengths2, codes1.shape[0])
+        return Similarity.jaro_rows(codes1, lengths1, codes2, lengths2)
+
+    # Поправка Винклера: бонус за общий префикс длиной до max_prefix символов
+    @staticmethod
+    def winkler(jaro, codes1, lengths1, codes2, lengths2, prefix_weight=0.1, max_prefix=4):
+        n = codes1.shape[0]
+        width = min(max_prefix, codes1.shape[1], codes2.shape[1])
+        codes2 = np.broadcast_to(codes2, (n, codes2.shape[1]))
+        limit = np.minimum(lengths1, np.broadcast_to(lengths2, (n,)))
+        same = (codes1[:, :width] == codes2[:, :width]) & (np.arange(width) < limit[:, None])
+        prefix = np.cumprod(same, axis=1).sum(axis=1)
+        return jaro + prefix * prefix_weight * (1 - jaro)
+
+    @staticmethod
+    def jaro_winkler_to_reference(values, reference, prefix_weight=0.1):
+        codes1, lengths1 = Similarity.encode(values)
+        codes2, lengths2 = Similarity.encode([reference])
+        jaro = Similarity.jaro_rows(codes1, lengths1, codes2, lengths2)
+        return Similarity.winkler(jaro, codes1, lengths1, codes2, lengths2, prefix_weight)
+
+    @staticmethod
+    def jaro_winkler_pairs(values1, values2, prefix_weight=0.1):
+        codes1, lengths1 = Similarity.encode(values1)
+        codes2, lengths2 = Similarity.encode(values2)
+        if codes2.shape[0] == 1 and codes1.shape[0] != 1:
+            codes2 = np.repeat(codes2, codes1.shape[0], axis=0)
+            lengths2 = np.repeat(lengths2, codes1.shape[0])
+        jaro = Similarity.jaro_rows(codes1, lengths1, codes2, lengths2)
+        return Similarity.winkler(jaro, codes1, lengths1, codes2, lengths2, prefix_weight)
+
+
+if numba is not None:
+    jaro_rows_loop = numba.njit(parallel=True, cache=True)(jaro_rows_loop)
@@ -0,0 +1,466 @@
+import json
+import os
+import shutil
+from array import array
+
+import numpy as np
+
+from MultiGraph import *
+
+
+# Столбец значений PropertyStore поверх отображенных в память массивов снимка:
+# значение декодируется при обращении, строки, добавленные после загрузки (слияния),
+# дописываются в обычный список
+class MappedColumn:
+    def __init__(self, kinds, offsets, data):
+        self.kinds = kinds
+        self.offsets = offsets
+        self.data = data
+        self.base = len(kinds)
+        self.tail = []
+
+    def __len__(self):
+        return self.base + len(self.tail)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if row >= self.base:
+            return self.tail[row - self.base]
+        return GraphSnapshot.decode(int(self.kinds[row]), self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+    # Отбрасывает строки от size; строки из файла снимка не удаляются
+    def truncate(self, size):
+        if size < self.base:
+            raise ValueError(f'Нельзя обрезать столбец снимка до {size} строк (в файле {self.base})')
+        del self.tail[size - self.base:]
+
+
+# То же для коэффициентов доверия: основа - отображенный float64, новые строки - array('d')
+class MappedTrust:
+    def __init__(self, values):
+        self.values = values
+        self.base = len(values)
+        self.tail = array('d')
+
+    def __len__(self):
+        return self.base + len(self.tail)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if row >= self.base:
+            return self.tail[row - self.base]
+        return float(self.values[row])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+    # Отбрасывает строки от size
+    def truncate(self, size):
+        if size < self.base:
+            raise ValueError(f'Нельзя обрезать столбец снимка до {size} строк (в файле {self.base})')
+        del self.tail[size - self.base:]
+
+    def take(self, rows):
+        rows = np.asarray(rows)
+        result = np.empty(len(rows))
+        in_base = rows < self.base
+        result[in_base] = self.values[rows[in_base]]
+        if not in_base.all():
+            result[~in_base] = np.frombuffer(self.tail, np.float64)[rows[~in_base] - self.base]
+
+        return result
+
+
+# Снимок как набор отображенных в память массивов, без объектов Vertex и Edge:
+# открывается за время чтения meta.json, и сколько бы процессов его ни открыли,
+# страницы файлов общие. Вершина здесь - номер строки снимка (0..vertex_count - 1),
+# ребра - пары номеров в edge_ends, смежность - CSR (adjacency_indptr, adjacency_edges).
+# Подходит для расчетов по массивам, например ClusterBuilder.components(arrays.vertex_count,
+# arrays.edge_ends[:, 0], arrays.edge_ends[:, 1], arrays.edge_weight)
+class SnapshotArrays:
+    def __init__(self, path):
+        self.path = path
+        self.meta = GraphSnapshot.read_meta(path)
+        load_array = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+        self.vertex_count = self.meta['vertices']
+        self.names = self.meta['names']
+        self.vertex_trusted = load_array('vertex_trusted')
+        self.vertex_completeness = load_array('vertex_completeness')
+        self.edge_id = load_array('edge_id')
+        self.edge_weight = load_array('edge_weight')
+        self.edge_ends = load_array('edge_ends').reshape(-1, 2)
+        self.adjacency_indptr = load_array('adjacency_indptr')
+        self.adjacency_edges = load_array('adjacency_edges')
+        self.hyperedge_id = load_array('hyperedge_id')
+        self.hyperedge_weight = load_array('hyperedge_weight')
+        self.hyperedge_offsets = load_array('hyperedge_offsets')
+        self.hyperedge_members = load_array('hyperedge_members')
+        self.columns = {name: MappedColumn(load_array(f'column{i}.kind'), load_array(f'column{i}.offsets'),
+                                           load_array(f'column{i}.data'))
+                        for i, name in enumerate(self.names)}
+        self.trust = {name: load_array(f'column{i}.trust') for i, name in enumerate(self.names)}
+        # Целые id вершин отображаются как есть, смешанные разбираются при первом обращении к ids
+        self._ids = load_array('vertex_id') if self.meta['vertex_id'] == 'int' else None
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = GraphSnapshot.load_ids(self.path, 'vertex_id', self.meta['vertex_id'], 'r')
+        return self._ids
+
+    # Номера соседей и номера ребер вершины i (срезы CSR, петля - один раз)
+    def neighbours(self, i):
+        edges = self.adjacency_edges[self.adjacency_indptr[i]:self.adjacency_indptr[i + 1]]
+        ends = self.edge_ends[edges]
+        return np.where(ends[:, 0] == i, ends[:, 1], ends[:, 0]), edges
+
+    # Номера вершин-участников k-го гиперребра
+    def members(self, k):
+        return self.hyperedge_members[self.hyperedge_offsets[k]:self.hyperedge_offsets[k + 1]]
+
+    # Значение свойства name вершины i (None, если у вершины его нет)
+    def value(self, i, name):
+        return self.columns[name][i]
+
+
+# Бинарный снимок MultiGraph: каталог плоских .npy-массивов и meta.json.
+# - вершины: id, is_trusted, completeness_coef, last_update (словарь дат + коды);
+# - свойства: по столбцу на имя - тип значения (uint8), смещения и байты UTF-8 (таблица строк),
+#   доверие float64. Строка столбца = номер вершины в снимке;
+# - ребра: id, концы (номера вершин), вес и CSR-смежность (indptr по вершинам + номера ребер);
+# - гиперребра: id, agr_weight, смещения и номера вершин-участников;
+# - lineage и счетчики id.
+# load отображает массивы в память (np.load(mmap_mode='r')): значения свойств не разбираются
+# при загрузке, а несколько процессов, загрузивших один снимок, делят страницы файлов.
+# Но load собирает MultiGraph целиком: объекты Vertex и Edge, словари смежности и id вершин
+# остаются в памяти каждого процесса, и время загрузки растет линейно (порядка секунд
+# на миллион вершин). Рабочим процессам, которым хватает массивов, - open: он только
+# отображает файлы (SnapshotArrays)
+class GraphSnapshot:
+    VERSION = 1
+    # Типы значений свойств
+    MISSING, NONE, STR, INT, FLOAT, BOOL = range(6)
+
+    @staticmethod
+    def encode(value):
+        if value is None:
+            return GraphSnapshot.NONE, b''
+        if isinstance(value, (bool, np.bool_)):
+            return GraphSnapshot.BOOL, b'1' if value else b'0'
+        if isinstance(value, (int, np.integer)):
+            return GraphSnapshot.INT, str(int(value)).encode()
+        if isinstance(value, (float, np.floating)):
+            # repr восстанавливается float() без потерь, включая nan и inf
+            return GraphSnapshot.FLOAT, repr(float(value)).encode()
+        return GraphSnapshot.STR, str(value).encode('utf-8')
+
+    @staticmethod
+    def decode(kind, raw):
+        if kind == GraphSnapshot.STR:
+            return raw.decode('utf-8')
+        if kind == GraphSnapshot.INT:
+            return int(raw)
+        if kind == GraphSnapshot.FLOAT:
+            return float(raw)
+        if kind == GraphSnapshot.BOOL:
+            return raw == b'1'
+        return None
+
+    # Таблица строк: смещения (int32, если данные меньше 2 ГБ) и байты подряд
+    @staticmethod
+    def string_table(items):
+        lengths = np.fromiter((len(item) for item in items), np.int64, len(items))
+        offsets = np.zeros(len(items) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if offsets[-1] < 2 ** 31:
+            offsets = offsets.astype(np.int32)
+
+        return offsets, np.frombuffer(b''.join(items), np.uint8)
+
+    @staticmethod
+    def save_strings(path, name, strings):
+        offsets, data = GraphSnapshot.string_table([string.encode('utf-8') for string in strings])
+        np.save(os.path.join(path, name + '.offsets.npy'), offsets)
+        np.save(os.path.join(path, name + '.data.npy'), data)
+
+    @staticmethod
+    def load_strings(path, name, mmap_mode):
+        offsets = np.load(os.path.join(path, name + '.offsets.npy'), mmap_mode=mmap_mode).tolist()
+        raw = np.load(os.path.join(path, name + '.data.npy'), mmap_mode=mmap_mode).tobytes()
+        if raw.isascii():
+            # Для ASCII смещения в байтах совпадают со смещениями в символах
+            text = raw.decode('ascii')
+            return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+        return [raw[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    # Список id: int64, если все id целые, иначе таблица строк и признак целого id
+    @staticmethod
+    def save_ids(path, name, ids):
+        if all(isinstance(v_id, (int, np.integer)) and not isinstance(v_id, bool) for v_id in ids):
+            np.save(os.path.join(path, name + '.npy'), np.array(ids, dtype=np.int64).reshape(-1))
+            return 'int'
+
+        is_int = np.fromiter((isinstance(v_id, (int, np.integer)) for v_id in ids), np.bool_, len(ids))
+        np.save(os.path.join(path, name + '.is_int.npy'), is_int)
+        GraphSnapshot.save_strings(path, name, [str(v_id) for v_id in ids])
+        return 'mixed'
+
+    @staticmethod
+    def load_ids(path, name, kind, mmap_mode):
+        if kind == 'int':
+            return np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode).tolist()
+
+        ids = GraphSnapshot.load_strings(path, name, mmap_mode)
+        is_int = np.load(os.path.join(path, name + '.is_int.npy'), mmap_mode=mmap_mode)
+        for i in np.flatnonzero(is_int).tolist():
+            ids[i] = int(ids[i])
+
+        return ids
+
+    # Номера вершин в CSR: offsets[i]:offsets[i + 1] - участники i-го списка
+    @staticmethod
+    def csr(groups):
+        lengths = np.fromiter((len(group) for group in groups), np.int64, len(groups))
+        offsets = np.zeros(len(groups) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets, lengths
+
+    # Снимок пишется в соседний каталог path.tmp и только потом подменяет path.
+    # Прежние файлы не перезаписываются на месте: граф, загруженный из path, продолжает
+    # читать свои отображенные массивы и номера строк (на POSIX удаленные файлы остаются
+    # доступны, пока отображены). Если подмена не удалась (Windows не переименовывает
+    # каталог с отображенными файлами), прежний снимок остается в path, новый - в path.tmp
+    @staticmethod
+    def save(graph: MultiGraph, path):
+        path = os.path.normpath(path)
+        temp_path = path + '.tmp'
+        old_path = path + '.old'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        GraphSnapshot.write(graph, temp_path)
+        if os.path.exists(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    # Запись снимка в новый каталог path
+    @staticmethod
+    def write(graph: MultiGraph, path):
+        os.makedirs(path)
+        # meta.json пишется последним: снимок без него считается недописанным
+        meta_path = os.path.join(path, 'meta.json')
+        array_path = lambda name: os.path.join(path, name + '.npy')
+
+        vertices = list(graph.vertices.values())
+        index = {vertex.id: i for i, vertex in enumerate(vertices)}
+        meta = {
+            'version': GraphSnapshot.VERSION,
+            'vertices': len(vertices),
+            'next_vertex_id': graph.vertex_ids.next_id,
+            'next_edge_id': graph.edge_ids.next_id,
+            'next_hyperedge_id': graph.hyperedge_ids.next_id,
+        }
+
+        # Вершины
+        meta['vertex_id'] = GraphSnapshot.save_ids(path, 'vertex_id', [vertex.id for vertex in vertices])
+        np.save(array_path('vertex_in_store'), np.fromiter((vertex.store is not None for vertex in vertices), np.bool_, len(vertices)))
+        np.save(array_path('vertex_trusted'), np.array([vertex.is_trusted for vertex in vertices]).reshape(-1))
+        np.save(array_path('vertex_completeness'), np.array([vertex.completeness_coef for vertex in vertices], dtype=np.float64).reshape(-1))
+        dates = {}
+        codes = np.fromiter((dates.setdefault(vertex.last_update, len(dates)) for vertex in vertices), np.int32, len(vertices))
+        np.save(array_path('vertex_last_update'), codes)
+        GraphSnapshot.save_strings(path, 'last_update', list(dates))
+
+        # Свойства: имена столбцов хранилищ, затем имена из наборов Property в порядке появления
+        names = {}
+        for vertex in vertices:
+            if vertex.store is not None:
+                for name in vertex.store.names:
+                    names.setdefault(name, len(names))
+        meta['store_names'] = len(names)
+        cells = []
+        for vertex in vertices:
+            if vertex.store is not None:
+                cells.append(None)
+            else:
+                row = {}
+                for prop in vertex.properties:
+                    names.setdefault(prop.name, len(names))
+                    row[prop.name] = prop
+                cells.append(row)
+        meta['names'] = list(names)
+
+        for i, name in enumerate(names):
+            kinds = np.zeros(len(vertices), np.uint8)
+            trust = np.ones(len(vertices))
+            items = []
+            for row, (vertex, props) in enumerate(zip(vertices, cells)):
+                if props is None:
+                    store = vertex.store
+                    column = store.columns.get(name)
+                    if column is None:
+                        items.append(b'')
+                        continue
+                    value = store.values[column][vertex.row]
+                    trust[row] = store.trust[column][vertex.row]
+                else:
+                    prop = props.get(name)
+                    if prop is None:
+                        items.append(b'')
+                        continue
+                    value = prop.value
+                    trust[row] = prop.trusted_coefficient
+                kinds[row], raw = GraphSnapshot.encode(value)
+                items.append(raw)
+
+            offsets, data = GraphSnapshot.string_table(items)
+            np.save(array_path(f'column{i}.kind'), kinds)
+            np.save(array_path(f'column{i}.offsets'), offsets)
+            np.save(array_path(f'column{i}.data'), data)
+            np.save(array_path(f'column{i}.trust'), trust)
+
+        # Ребра: сохраняются только ребра между вершинами графа
+        edges = [edge for edge in graph.edges if edge.v1_id in index and edge.v2_id in index]
+        ends = np.array([(index[edge.v1_id], index[edge.v2_id]) for edge in edges], dtype=np.int64).reshape(-1, 2)
+        np.save(array_path('edge_id'), np.array([edge.id for edge in edges], dtype=np.int64).reshape(-1))
+        np.save(array_path('edge_weight'), np.array([edge.weight for edge in edges], dtype=np.float64).reshape(-1))
+        np.save(array_path('edge_ends'), ends)
+        # CSR-смежность: ребро попадает в списки обоих концов (петля - один раз)
+        owners = np.concatenate([ends[:, 0], ends[:, 1][ends[:, 1] != ends[:, 0]]])
+        edge_numbers = np.concatenate([np.arange(len(edges)), np.flatnonzero(ends[:, 1] != ends[:, 0])])
+        order = np.argsort(owners, kind='stable')
+        np.save(array_path('adjacency_indptr'), np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=len(vertices)))]).astype(np.int64))
+        np.save(array_path('adjacency_edges'), edge_numbers[order].astype(np.int64))
+
+        # Гиперребра: участники - номера вершин графа
+        hyperedges = list(graph.hyperedges)
+        members = [[index[v_id] for v_id in hyperedge.v_ids if v_id in index] for hyperedge in hyperedges]
+        offsets, _ = GraphSnapshot.csr(members)
+        np.save(array_path('hyperedge_id'), np.array([hyperedge.id for hyperedge in hyperedges], dtype=np.int64).reshape(-1))
+        np.save(array_path('hyperedge_weight'), np.array([hyperedge.agr_weight for hyperedge in hyperedges], dtype=np.float64).reshape(-1))
+        np.save(array_path('hyperedge_offsets'), offsets)
+        np.save(array_path('hyperedge_members'), np.array([m for group in members for m in group], dtype=np.int64))
+
+        # Родословная слитых вершин: id новой вершины и id исходных
+        lineage = list(graph.lineage.items())
+        offsets, _ = GraphSnapshot.csr([parents for _, parents in lineage])
+        meta['lineage_key'] = GraphSnapshot.save_ids(path, 'lineage_key', [key for key, _ in lineage])
+        meta['lineage_parent'] = GraphSnapshot.save_ids(path, 'lineage_parent', [v_id for _, parents in lineage for v_id in parents])
+        np.save(array_path('lineage_offsets'), offsets)
+
+        with open(meta_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+
+    @staticmethod
+    def read_meta(path):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta['version'] != GraphSnapshot.VERSION:
+            raise ValueError(f'Неподдерживаемая версия снимка: {meta["version"]}')
+
+        return meta
+
+    # Снимок без сборки графа: только отображенные массивы
+    @staticmethod
+    def open(path):
+        return SnapshotArrays(path)
+
+    # Загружает граф из снимка. Вершины из хранилищ получают общий PropertyStore, столбцы
+    # которого читают значения прямо из отображенных файлов; вершины с наборами Property
+    # получают их обратно. mmap = False читает массивы в память целиком
+    @staticmethod
+    def load(path, mmap = True):
+        meta = GraphSnapshot.read_meta(path)
+        mmap_mode = 'r' if mmap else None
+        load_array = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+
+        count = meta['vertices']
+        names = meta['names']
+        values = [MappedColumn(load_array(f'column{i}.kind'), load_array(f'column{i}.offsets'), load_array(f'column{i}.data'))
+                  for i in range(len(names))]
+        trust = [MappedTrust(load_array(f'column{i}.trust')) for i in range(len(names))]
+        # Хранилищу достаются только столбцы хранилищ, остальные есть лишь у вершин с наборами Property
+        store = PropertyStore(names[:meta['store_names']])
+        store.values = values[:len(store.names)]
+        store.trust = trust[:len(store.names)]
+        store.size = count
+
+        ids = GraphSnapshot.load_ids(path, 'vertex_id', meta['vertex_id'], mmap_mode)
+        dates = GraphSnapshot.load_strings(path, 'last_update', mmap_mode)
+        in_store = load_array('vertex_in_store')
+        vertices = []
+        for row, (v_id, is_trusted, completeness_coef, date, stored) in enumerate(zip(
+                ids, load_array('vertex_trusted').tolist(), load_array('vertex_completeness').tolist(),
+                load_array('vertex_last_update').tolist(), in_store.tolist())):
+            if stored:
+                vertex = Vertex(v_id, is_trusted=is_trusted, completeness_coef=completeness_coef, last_update=dates[date], store=store, row=row)
+            else:
+                vertex = Vertex(v_id, GraphSnapshot.row_properties(names, values, trust, row), is_trusted, completeness_coef, dates[date])
+            vertices.append(vertex)
+
+        graph = MultiGraph()
+        graph.vertices = {vertex.id: vertex for vertex in vertices}
+
+        # Ребра и смежность по CSR: каждая вершина получает свои ребра одним срезом
+        ends = load_array('edge_ends').tolist()
+        edges = [Edge(e_id, weight, ids[v1], ids[v2]) for e_id, weight, (v1, v2) in
+                 zip(load_array('edge_id').tolist(), load_array('edge_weight').tolist(), ends)]
+        graph.edges = set(edges)
+        indptr = load_array('adjacency_indptr').tolist()
+        numbers = np.asarray(load_array('adjacency_edges'))
+        owners = np.repeat(np.arange(count), np.diff(indptr))
+        ends_array = np.asarray(load_array('edge_ends')).reshape(-1, 2)[numbers]
+        neighbours = np.where(ends_array[:, 0] == owners, ends_array[:, 1], ends_array[:, 0]).tolist()
+        adjacent_edges = [edges[number] for number in numbers.tolist()]
+        adjacent_ids = [ids[neighbour] for neighbour in neighbours]
+        for vertex, start, end in zip(vertices, indptr, indptr[1:]):
+            if start != end:
+                adjacency = dict(zip(adjacent_ids[start:end], adjacent_edges[start:end]))
+                if len(adjacency) == end - start:
+                    vertex.set_adjacency(adjacency)
+                else:
+                    # Есть параллельные ребра: раскладываются через add_edge
+                    vertex.edges = adjacent_edges[start:end]
+
+        offsets = load_array('hyperedge_offsets').tolist()
+        members = load_array('hyperedge_members').tolist()
+        for h_id, agr_weight, start, end in zip(load_array('hyperedge_id').tolist(), load_array('hyperedge_weight').tolist(), offsets, offsets[1:]):
+            graph.add_hyperedge(Hyperedge(h_id, agr_weight, [ids[m] for m in members[start:end]]))
+
+        keys = GraphSnapshot.load_ids(path, 'lineage_key', meta['lineage_key'], mmap_mode)
+        parents = GraphSnapshot.load_ids(path, 'lineage_parent', meta['lineage_parent'], mmap_mode)
+        offsets = load_array('lineage_offsets').tolist()
+        graph.lineage = {key: tuple(parents[start:end]) for key, start, end in zip(keys, offsets, offsets[1:])}
+
+        graph.vertex_ids.next_id = meta['next_vertex_id']
+        graph.edge_ids.next_id = meta['next_edge_id']
+        graph.hyperedge_ids.next_id = meta['next_hyperedge_id']
+
+        return graph
+
+    # Набор Property вершины без хранилища: только столбцы, которые у нее были
+    @staticmethod
+    def row_properties(names, values, trust, row):
+        return {Property(name, column[row], column_trust[row])
+                for name, column, column_trust in zip(names, values, trust) if column.kinds[row] != GraphSnapshot.MISSING}
@@ -1,11 +1,25 @@
 import plotly.graph_objects as go
 import networkx as nx
 import numpy as np
+from collections import deque
+from scipy.sparse import diags, identity
+from scipy.sparse.linalg import eigsh
 from scipy.spatial import ConvexHull
-import random
 
 class GraphVisual:
-
+    # Выше этого числа вершин узлы рисуются через WebGL, без подписей,
+    # а плотные области сворачиваются в ячейки сетки
+    LARGE_GRAPH = 2000
+    # Число ячеек сетки по каждой оси при свертке плотных областей
+    AGGREGATE_BINS = 100
+    # Компоненты до SMALL_COMPONENT вершин раскладываются правильным многоугольником,
+    # до SPRING_LIMIT - spring_layout, больше - spectral_points (spring_layout на них квадратичен)
+    SMALL_COMPONENT = 5
+    SPRING_LIMIT = 1000
+    # Гиперребра раскрашиваются по палитре: одна трасса на цвет, а не на гиперребро
+    HULL_COLORS = [f'rgba({r}, {g}, {b}, 0.5)' for r, g, b in
+                   [(31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40),
+                    (148, 103, 189), (140, 86, 75), (227, 119, 194), (188, 189, 34)]]
     # Адаптер наших вершин к вершинам Plotly
     @staticmethod
     def vertex_adapter(vertices):
@@ -29,102 +43,311 @@ class GraphVisual:
     def hyperedge_adapter(hyperedges):
         result = []
         for edge in hyperedges:
-            edgeVertices = []
-            for vertex in edge.vertices:
-                edgeVertices.append(vertex.name)
-            result.append(edgeVertices)
+            # Вершины гиперребра - словарь имя -> Vertex
+            result.append(list(edge.vertices))
 
         return result
 
-    # Основная функция отрисовки графа
+    # Адаптер MultiGraph: вершины - id, ребра - (v1_id, v2_id, weight), гиперребра - списки id
     @staticmethod
-    def graph_output(vertices, edges, hyperedges):
-        # Создаем граф
-        G = nx.Graph()
+    def multigraph_adapter(graph):
+        vertices = list(graph.vertices)
+        edges = [(edge.v1_id, edge.v2_id, edge.weight) for edge in graph.edges
+                 if edge.v1_id in graph.vertices and edge.v2_id in graph.vertices]
+        hyperedges = [[v_id for v_id in hyperedge.v_ids if v_id in graph.vertices] for hyperedge in graph.hyperedges]
 
-        # Добавляем узлы
-        G.add_nodes_from(vertices)
+        return vertices, edges, hyperedges
+
+    # Окрестность центра: вершины не дальше radius ребер от center (имя или id вершины,
+    # либо list/tuple/set имен, например вершины гиперребра), не больше max_nodes - ближайшие первыми.
+    # Возвращает вершины, ребра и гиперребра в формате адаптеров
+    @staticmethod
+    def neighbourhood(vertices, edges, hyperedges, center, radius = 2, max_nodes = None):
+        adjacency = {}
+        for edge in edges:
+            adjacency.setdefault(edge[0], []).append(edge[1])
+            adjacency.setdefault(edge[1], []).append(edge[0])
+
+        centers = list(center) if isinstance(center, (list, tuple, set)) else [center]
+        known = set(vertices)
+        kept = {}
+        queue = deque()
+        for name in centers:
+            if name in known and name not in kept:
+                kept[name] = 0
+                queue.append(name)
+        while queue and (max_nodes is None or len(kept) < max_nodes):
+            name = queue.popleft()
+            if kept[name] == radius:
+                continue
+            for neighbour in adjacency.get(name, []):
+                if neighbour not in kept:
+                    kept[neighbour] = kept[name] + 1
+                    queue.append(neighbour)
+                    if max_nodes is not None and len(kept) >= max_nodes:
+                        break
+
+        result_edges = [edge for edge in edges if edge[0] in kept and edge[1] in kept]
+        result_hyperedges = []
+        for edge in hyperedges:
+            edge_vertices = [name for name in edge if name in kept]
+            if edge_vertices:
+                result_hyperedges.append(edge_vertices)
+
+        return list(kept), result_edges, result_hyperedges
 
-        # Добавляем рёбра с весами
+    @staticmethod
+    def build_graph(vertices, edges):
+        G = nx.Graph()
+        G.add_nodes_from(vertices)
         for edge in edges:
             G.add_edge(edge[0], edge[1], weight=edge[2])
 
-        # Получаем позиции узлов для визуализации
-        pos = nx.spring_layout(G)
+        return G
 
-        # Создаем фигуру
-        fig = go.Figure()
+    # Раскладка компоненты без заданных позиций в круг радиуса ~ sqrt(числа вершин)
+    @staticmethod
+    def component_layout(G, component, seed, iterations):
+        nodes = list(component)
+        count = len(nodes)
+        if count == 1:
+            points = np.zeros((1, 2))
+        elif count <= GraphVisual.SMALL_COMPONENT:
+            angles = 2 * np.pi * np.arange(count) / count
+            points = np.column_stack([np.cos(angles), np.sin(angles)])
+        else:
+            subgraph = G.subgraph(nodes)
+            if count <= GraphVisual.SPRING_LIMIT:
+                layout = nx.spring_layout(subgraph, seed=seed, iterations=iterations)
+                points = np.array([layout[node] for node in nodes], dtype=float)
+            else:
+                points = GraphVisual.spectral_points(subgraph, nodes)
+            points -= points.mean(axis=0)
+            scale = np.abs(points).max()
+            if scale > 0:
+                points /= scale
 
-        # Извлекаем координаты для рёбер
-        x_edges = []
-        y_edges = []
-        for edge in G.edges(data=True):
-            x_edges.append(pos[edge[0]][0])
-            x_edges.append(pos[edge[1]][0])
-            x_edges.append(None)  # Разрывы между рёбрами
-            y_edges.append(pos[edge[0]][1])
-            y_edges.append(pos[edge[1]][1])
-            y_edges.append(None)  # Разрывы между рёбрами
+        return nodes, points * 0.5 * np.sqrt(count)
 
-        # Добавляем области (гиперребра)
-        for edge in hyperedges:
-            points = np.array([pos[v] for v in edge])
-
-            # Нахождение выпуклой оболочки
-            if len(points) > 2:  # Для выпуклой оболочки нужно минимум 3 точки
-                hull = ConvexHull(points)
-                x0 = points[hull.vertices, 0]
-                y0 = points[hull.vertices, 1]
-
-                # Замыкание обхода
-                x0 = np.append(x0, x0[0])
-                y0 = np.append(y0, y0[0])
-
-                # Добавляем гиперребро
-                fig.add_trace(go.Scatter(
-                    x=x0,
-                    y=y0,
-                    mode='lines+text',
+    # Спектральная раскладка большой связной компоненты: собственные векторы 2 и 3 нормированной
+    # матрицы смежности ленивого блуждания. ARPACK находит наибольшие собственные значения
+    # за доли секунды, тогда как наименьшие у лапласиана (nx.spectral_layout) - за десятки секунд
+    @staticmethod
+    def spectral_points(G, nodes):
+        adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format='csr').astype(float)
+        degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+        scale = diags(1 / np.sqrt(degrees))
+        walk = (scale @ adjacency @ scale + identity(len(nodes))) / 2
+        _, vectors = eigsh(walk, k=3, which='LA', tol=1e-3, v0=np.sqrt(degrees))
+
+        # Собственные значения по возрастанию: последний вектор - тривиальный
+        return scale @ vectors[:, :2]
+
+    # Позиции узлов графа G: дополняет и возвращает pos (имя -> (x, y), None - новый словарь).
+    # Узлы, уже лежащие в pos, не двигаются; новые узлы компоненты с известными позициями
+    # ставятся в центр уже размещенных соседей, полностью новые компоненты раскладываются
+    # отдельно и укладываются полками ниже остальных
+    @staticmethod
+    def layout(G, pos = None, seed = 42, iterations = 50):
+        pos = {} if pos is None else pos
+        rng = np.random.default_rng(seed)
+
+        new_components = []
+        for component in nx.connected_components(G):
+            missing = [node for node in component if node not in pos]
+            if not missing:
+                continue
+            if len(missing) == len(component):
+                new_components.append(component)
+            else:
+                GraphVisual.place_near_neighbours(G, component, pos, rng)
+
+        if not new_components:
+            return pos
+
+        # Полочная укладка: компоненты по убыванию размера, ряды шириной ~ корень из общей площади
+        new_components.sort(key=len, reverse=True)
+        width = np.sqrt(sum(len(component) for component in new_components)) * 1.2 + 1
+        top = min((y for _, y in pos.values()), default=0.0) - 1
+        x = 0.0
+        row_height = 0.0
+        for component in new_components:
+            nodes, points = GraphVisual.component_layout(G, component, seed, iterations)
+            size = np.sqrt(len(nodes)) + 1
+            if x > 0 and x + size > width:
+                top -= row_height
+                x = 0.0
+                row_height = 0.0
+            points = points + (x + size / 2, top - size / 2)
+            for node, point in zip(nodes, points.tolist()):
+                pos[node] = tuple(point)
+            x += size
+            row_height = max(row_height, size)
+
+        return pos
+
+    # Новые узлы компоненты в порядке обхода в ширину от уже размещенных:
+    # каждый - в центр размещенных соседей с небольшим сдвигом
+    @staticmethod
+    def place_near_neighbours(G, component, pos, rng):
+        queue = deque(node for node in component if node in pos)
+        while queue:
+            node = queue.popleft()
+            for neighbour in G.neighbors(node):
+                if neighbour in pos:
+                    continue
+                placed = [pos[other] for other in G.neighbors(neighbour) if other in pos]
+                pos[neighbour] = tuple(np.mean(placed, axis=0) + rng.normal(0, 0.1, 2))
+                queue.append(neighbour)
+
+    # Выпуклые оболочки всех гиперребер за один проход: по одному массиву x и y на цвет палитры,
+    # многоугольники разделены None (fill='toself' заливает каждый отдельно).
+    # skip - необязательная функция от индексов вершин, отбрасывающая гиперребро
+    @staticmethod
+    def hull_traces(hyperedges, index, xy, skip = None):
+        colors = GraphVisual.HULL_COLORS
+        xs = [[] for _ in colors]
+        ys = [[] for _ in colors]
+        for i, edge in enumerate(hyperedges):
+            members = [index[v] for v in edge if v in index]
+            if len(members) < 2 or (skip is not None and skip(members)):
+                continue
+
+            points = xy[members]
+            try:
+                # Для выпуклой оболочки нужно минимум 3 точки не на одной прямой
+                points = points[ConvexHull(points).vertices] if len(points) > 2 else points
+            except RuntimeError:
+                order = np.lexsort((points[:, 1], points[:, 0]))
+                points = points[[order[0], order[-1]]]
+
+            # Замыкание обхода и разрыв перед следующим гиперребром
+            xs[i % len(colors)].extend(points[:, 0].tolist() + [points[0, 0], None])
+            ys[i % len(colors)].extend(points[:, 1].tolist() + [points[0, 1], None])
+
+        traces = []
+        for color, x, y in zip(colors, xs, ys):
+            if x:
+                traces.append(go.Scatter(
+                    x=x,
+                    y=y,
+                    mode='lines',
                     fill='toself',
                     name='Гиперребро',
                     line=dict(color='lightblue', width=2),
-                    fillcolor=f'rgba({random.randint(0, 255)}, {random.randint(0, 255)}, {random.randint(0, 255)}, 0.5)',
+                    fillcolor=color,
                     hoverinfo='text',
                     hovertext='Гиперребро'  # Текст для отображения при наведении
                 ))
 
-        # Извлекаем координаты узлов
-        x_nodes = [pos[node][0] for node in G.nodes()]
-        y_nodes = [pos[node][1] for node in G.nodes()]
+        return traces
+
+    # Свертка плотных областей: узлы одной ячейки сетки bins x bins становятся одним маркером
+    # в центре ячейки. Возвращает номер ячейки-маркера для каждого узла, центры и размеры ячеек
+    @staticmethod
+    def aggregate(xy, bins):
+        low = xy.min(axis=0)
+        span = np.maximum(xy.max(axis=0) - low, 1e-9)
+        cells = np.minimum((xy - low) / span * bins, bins - 1).astype(np.int64)
+        _, inverse, counts = np.unique(cells[:, 0] * bins + cells[:, 1], return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        centers = np.column_stack([np.bincount(inverse, xy[:, 0]), np.bincount(inverse, xy[:, 1])]) / counts[:, None]
+
+        return inverse, centers, counts
+
+    # Основная функция отрисовки графа.
+    # center - имя (id) вершины или список имен (гиперребро): рисуется только окрестность радиуса radius,
+    # не больше max_nodes вершин. Графы больше LARGE_GRAPH рисуются в режиме для больших графов.
+    # pos - словарь позиций одного графа, который вызывающий передает между кадрами,
+    # чтобы уже разложенные узлы не двигались (None - раскладка с нуля)
+    @staticmethod
+    def graph_output(vertices, edges, hyperedges, center = None, radius = 2, max_nodes = None, show = True, pos = None):
+        if center is not None:
+            vertices, edges, hyperedges = GraphVisual.neighbourhood(vertices, edges, hyperedges, center, radius,
+                                                                    max_nodes or GraphVisual.LARGE_GRAPH)
+
+        # Создаем граф
+        G = GraphVisual.build_graph(vertices, edges)
+
+        # Получаем позиции узлов для визуализации (дополняют переданный pos)
+        pos = GraphVisual.layout(G, pos)
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+        large = len(nodes) > GraphVisual.LARGE_GRAPH
+        scatter = go.Scattergl if large else go.Scatter
+
+        # Создаем фигуру
+        fig = go.Figure()
+
+        if large:
+            cell, centers, counts = GraphVisual.aggregate(xy, GraphVisual.AGGREGATE_BINS)
+            # Гиперребро внутри одной ячейки все равно не видно
+            skip = lambda members: (cell[members] == cell[members[0]]).all()
+        else:
+            skip = None
+
+        # Добавляем области (гиперребра)
+        for trace in GraphVisual.hull_traces(hyperedges, index, xy, skip):
+            fig.add_trace(trace)
+
+        # Извлекаем координаты для рёбер: разрывы (None) между рёбрами
+        pairs = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+        if large and len(pairs):
+            # Ребра между ячейками: по одному на пару ячеек, ребра внутри ячейки не рисуются
+            pairs = np.sort(cell[pairs], axis=1)
+            pairs = np.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0)
+            points = centers
+        else:
+            points = xy
+        x_edges = np.full(len(pairs) * 3, None, dtype=object)
+        y_edges = np.full(len(pairs) * 3, None, dtype=object)
+        x_edges[0::3] = points[pairs[:, 0], 0]
+        x_edges[1::3] = points[pairs[:, 1], 0]
+        y_edges[0::3] = points[pairs[:, 0], 1]
+        y_edges[1::3] = points[pairs[:, 1], 1]
 
         # Добавляем рёбра
-        fig.add_trace(go.Scatter(
-            x=x_edges,
-            y=y_edges,
+        fig.add_trace(scatter(
+            x=x_edges.tolist(),
+            y=y_edges.tolist(),
             mode='lines',
-            line=dict(width=2, color='rgba(90, 34, 139, 0.5)'),
+            line=dict(width=1 if large else 2, color='rgba(90, 34, 139, 0.5)'),
             hoverinfo='none'
         ))
 
-        # Добавляем узлы
-        fig.add_trace(go.Scatter(
-            x=x_nodes,
-            y=y_nodes,
-            mode='markers',
-            marker=dict(size=35, color='purple', line=dict(color='rgba(255, 255, 255, 1)', width=6)),
-            hoverinfo='none'
-        ))
+        if large:
+            # Добавляем ячейки: размер маркера растет с числом вершин, имя - при наведении
+            first = np.empty(len(counts), np.int64)
+            first[cell] = np.arange(len(nodes))
+            fig.add_trace(go.Scattergl(
+                x=centers[:, 0],
+                y=centers[:, 1],
+                mode='markers',
+                marker=dict(size=(6 + 4 * np.log2(counts)).tolist(), color='purple', opacity=0.8),
+                hovertext=[str(nodes[i]) if count == 1 else f'{count} вершин'
+                           for i, count in zip(first.tolist(), counts.tolist())],
+                hoverinfo='text'
+            ))
+        else:
+            # Добавляем узлы
+            fig.add_trace(go.Scatter(
+                x=xy[:, 0],
+                y=xy[:, 1],
+                mode='markers',
+                marker=dict(size=35, color='purple', line=dict(color='rgba(255, 255, 255, 1)', width=6)),
+                hoverinfo='none'
+            ))
 
-        # Добавляем черные подложки под текст меток узлов
-        for i, node in enumerate(G.nodes()):
+            # Метки узлов одной трассой
             fig.add_trace(go.Scatter(
-                x=[pos[node][0]],  # Позиция узла
-                y=[pos[node][1]],  # Чуть ниже узла
-                mode='markers+text',
-                marker=dict(size=25, color='black', opacity=0),  # Черная подложка
-                text=[str(node)],
+                x=xy[:, 0],
+                y=xy[:, 1],
+                mode='text',
+                text=[str(node) for node in nodes],
                 textposition="middle center",
-                textfont=dict(color='white', size=16, family='Trebuchet MS', weight='bold')
+                textfont=dict(color='white', size=16, family='Trebuchet MS', weight='bold'),
+                hoverinfo='none'
             ))
 
         # Настраиваем оси и фон
@@ -139,4 +362,229 @@ class GraphVisual:
         )
 
         # Показываем граф
-        fig.show()
\ No newline at end of file
+        if show:
+            fig.show()
+
+        return fig
+
+
+# Точки трассы со свободными слотами: удаление ставит NaN (Plotly их пропускает),
+# новые точки занимают освободившиеся слоты, так что шаг меняет O(1) элементов массивов.
+# width - точек на элемент: 1 для узла, 3 для ребра (два конца и разрыв).
+# Слоты разбиты на страницы по page штук - по трассе на страницу; dirty - номера страниц,
+# измененных с последней отправки в фигуру
+class PointSlots:
+    def __init__(self, width = 1, page = 2048):
+        self.width = width
+        self.page = page
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        # Подписи - массив объектов: Plotly проверяет его на порядок быстрее списка строк
+        self.text = np.empty(0, dtype=object)
+        self.size = 0
+        self.slots = {}
+        self.free = []
+        self.dirty = set()
+
+    @property
+    def pages(self):
+        return max(1, -(-self.size // self.page))
+
+    # Точки и подписи страницы: срезы общих массивов
+    def page_points(self, page):
+        start = page * self.page
+        end = start + self.page
+        return self.x[start * self.width:end * self.width], self.y[start * self.width:end * self.width], self.text[start:end]
+
+    def add(self, key, xs, ys, text = ''):
+        slot = self.slots.get(key)
+        if slot is not None:
+            pass
+        elif self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.size
+            self.size += 1
+            if slot == len(self.text):
+                # Массивы растут удвоением
+                size = max(16, len(self.text))
+                self.x = np.concatenate([self.x, np.full(size * self.width, np.nan)])
+                self.y = np.concatenate([self.y, np.full(size * self.width, np.nan)])
+                self.text = np.concatenate([self.text, np.full(size, '', dtype=object)])
+        start = slot * self.width
+        self.x[start:start + len(xs)] = xs
+        self.y[start:start + len(ys)] = ys
+        self.text[slot] = text
+        self.slots[key] = slot
+        self.dirty.add(slot // self.page)
+
+    def remove(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return
+        self.x[slot * self.width:(slot + 1) * self.width] = np.nan
+        self.y[slot * self.width:(slot + 1) * self.width] = np.nan
+        self.text[slot] = ''
+        self.free.append(slot)
+        self.dirty.add(slot // self.page)
+
+
+# Пошаговый показ слияний HistoryManager (MultiGraph) без перерисовки всего графа.
+# Позиции узлов хранятся между кадрами (self.positions), при слиянии размещается
+# только новая вершина - в центре своих родителей. Узлы и ребра разбиты на трассы-страницы
+# (PointSlots), и шаг отправляет в фигуру только измененные страницы, а не весь граф.
+# В Jupyter фигура - go.FigureWidget (нужен anywidget), иначе go.Figure
+class HistoryView:
+    # Слотов на трассу-страницу: шаг пересылает страницы затронутых слотов, а не все точки
+    PAGE = 2048
+
+    def __init__(self, history: 'HistoryManager', widget = True):
+        self.history = history
+        self.nodes = PointSlots(1, HistoryView.PAGE)
+        self.edges = PointSlots(3, HistoryView.PAGE)
+
+        vertices, edges, _ = GraphVisual.multigraph_adapter(history.graph)
+        # Позиции узлов этого графа: id вершины -> (x, y)
+        self.positions = GraphVisual.layout(GraphVisual.build_graph(vertices, edges))
+        pos = self.positions
+        for v_id in vertices:
+            self.add_node(v_id, pos)
+        for edge in history.graph.edges:
+            self.add_edge(edge, pos)
+
+        self.large = len(vertices) > GraphVisual.LARGE_GRAPH
+        self.figure = self.build_figure(widget)
+
+    def add_node(self, v_id, pos):
+        x, y = pos[v_id]
+        self.nodes.add(v_id, [x], [y], str(v_id))
+
+    def add_edge(self, edge, pos):
+        if edge.v1_id not in self.nodes.slots or edge.v2_id not in self.nodes.slots:
+            return
+        (x1, y1), (x2, y2) = pos[edge.v1_id], pos[edge.v2_id]
+        self.edges.add(edge.id, [x1, x2], [y1, y2])
+
+    def edge_trace(self, page):
+        x, y, _ = self.edges.page_points(page)
+        scatter = go.Scattergl if self.large else go.Scatter
+        return scatter(x=x, y=y, mode='lines', line=dict(width=1 if self.large else 2, color='rgba(90, 34, 139, 0.5)'),
+                       hoverinfo='none')
+
+    def node_trace(self, page):
+        x, y, text = self.nodes.page_points(page)
+        scatter = go.Scattergl if self.large else go.Scatter
+        return scatter(x=x, y=y, mode='markers' if self.large else 'markers+text',
+                       marker=dict(size=6 if self.large else 35, color='purple'),
+                       text=None if self.large else text, hovertext=text, hoverinfo='text',
+                       textfont=dict(color='white', size=16, family='Trebuchet MS', weight='bold'))
+
+    # Фигура: сначала трассы-страницы ребер, над ними - трассы-страницы узлов
+    def build_figure(self, widget):
+        self.edge_pages = self.edges.pages
+        self.node_pages = self.nodes.pages
+        traces = [self.edge_trace(page) for page in range(self.edge_pages)] + [self.node_trace(page) for page in range(self.node_pages)]
+        self.edges.dirty.clear()
+        self.nodes.dirty.clear()
+        layout = dict(
+            title='Визуализация гиперграфа с гиперребрами',
+            title_font=dict(size=20, color='darkblue'),
+            plot_bgcolor='rgba(255, 255, 255, 0.5)',
+            showlegend=False,
+            hovermode='closest',
+            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            # Оси не перемасштабируются при обновлении трасс
+            uirevision='history'
+        )
+        if widget:
+            try:
+                return go.FigureWidget(data=traces, layout=layout)
+            except ImportError:
+                pass
+
+        return go.Figure(data=traces, layout=layout)
+
+    # Применяет к кадру дельту шага step: forward - повтор слияния, иначе откат.
+    # Ребра родителей, оставшиеся в графе (слияние без debug не трогает ребра),
+    # скрываются вместе с родителями и возвращаются при откате
+    def apply(self, step, forward):
+        pos = self.positions
+        parents = [step.prev_vertex_1, step.prev_vertex_2]
+        removed_edges = step.prev_edges_1 | step.prev_edges_2
+        if forward:
+            if step.vertex.id not in pos:
+                placed = [pos[parent.id] for parent in parents if parent.id in pos]
+                pos[step.vertex.id] = tuple(np.mean(placed, axis=0)) if placed else (0.0, 0.0)
+            for edge in removed_edges:
+                self.edges.remove(edge.id)
+            for parent in parents:
+                for edge in parent.edges:
+                    self.edges.remove(edge.id)
+                self.nodes.remove(parent.id)
+            self.add_node(step.vertex.id, pos)
+            for edge in step.add_edges:
+                self.add_edge(edge, pos)
+        else:
+            for edge in step.add_edges:
+                self.edges.remove(edge.id)
+            self.nodes.remove(step.vertex.id)
+            for parent in parents:
+                self.add_node(parent.id, pos)
+            for edge in removed_edges:
+                self.add_edge(edge, pos)
+            for parent in parents:
+                for edge in parent.edges:
+                    self.add_edge(edge, pos)
+
+    # Отправляет в фигуру только измененные страницы. Новые страницы (массивы выросли)
+    # добавляются трассами, и ребра переставляются под узлы
+    def update(self):
+        figure = self.figure
+        new_edges = [self.edge_trace(page) for page in range(self.edge_pages, self.edges.pages)]
+        new_nodes = [self.node_trace(page) for page in range(self.node_pages, self.nodes.pages)]
+        if new_edges or new_nodes:
+            figure.add_traces(new_edges + new_nodes)
+            data = figure.data
+            edges_end = self.edge_pages
+            nodes_end = self.edge_pages + self.node_pages
+            figure.data = (data[:edges_end] + data[nodes_end:nodes_end + len(new_edges)] +
+                           data[edges_end:nodes_end] + data[nodes_end + len(new_edges):])
+
+        with figure.batch_update():
+            node_start = self.edges.pages
+            for page in self.edges.dirty:
+                if page < self.edge_pages:
+                    trace = figure.data[page]
+                    trace.x, trace.y, _ = self.edges.page_points(page)
+            for page in self.nodes.dirty:
+                if page < self.node_pages:
+                    trace = figure.data[node_start + page]
+                    trace.x, trace.y, text = self.nodes.page_points(page)
+                    trace.hovertext = text
+                    if not self.large:
+                        trace.text = text
+        self.edge_pages = self.edges.pages
+        self.node_pages = self.nodes.pages
+        self.edges.dirty.clear()
+        self.nodes.dirty.clear()
+
+    def next_step(self):
+        self.go_to(self.history.current_step + 1)
+
+    def prev_step(self):
+        self.go_to(self.history.current_step - 1)
+
+    # Переход к шагу истории: дельты применяются к графу и к кадру, фигура обновляется один раз
+    def go_to(self, step):
+        history = self.history
+        step = max(-1, min(step, len(history.history) - 1))
+        while history.current_step < step:
+            history.next_step()
+            self.apply(history.history[history.current_step], True)
+        while history.current_step > step:
+            self.apply(history.history[history.current_step], False)
+            history.prev_step()
+        self.update()
+
+        return self.figure
@@ -2,14 +2,18 @@ import time
 import pandas as pd
 from LoadAdapter import *
 import json
+import numpy as np
 
 from MultiGraph import *
 from CleanData import *
+from Blocking import BlockingIndex
+from MinHash import MinHashIndex
+from Profiler import Profiler
 
 
 def new_test():
     vertex_list = parse_csv_to_vertices('first100.csv')
-    vertex_list = parse_json_to_vertices(vertex_list, 'comp.json')
+    vertex_list = attach_completeness(vertex_list, 'comp.npy')
 
     for vertex in vertex_list:
         print(f'ID: {vertex.id}, Completeness Coefficient: {vertex.completeness_coef}')
@@ -53,47 +57,125 @@ def test_similar():
     # Выводим строки с неверными адресами электронной почты
     print(invalid_emails[['contact_email']])
 
-def parse_json_to_vertices(vertices, json_file):
-    with open(json_file, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-
-    # Обновление completeness_coef для каждой вершины
-    for vertex in vertices:
-        if vertex.id in data:
-            completeness = data[vertex.id].get('Полнота', None)
-            if completeness is not None:
-                try:
-                    # Приведение к float, если значение существует
-                    vertex.completeness_coef = float(completeness)
-                except ValueError:
-                    print(f'Warning: Ignored invalid completeness value for vertex {vertex.id}: {completeness}')
+# id вершин для сравнения со столбцом id таблицы полноты. Строки сравниваются в общей ширине <U
+# (без обрезки до ширины таблицы), с числовым столбцом - числа; valid отмечает id,
+# которые удалось привести (нечисловая строка при числовом столбце не найдется)
+def comparable_ids(vertices, table_ids):
+    ids = np.array([vertex.id for vertex in vertices])
+    valid = np.ones(len(ids), dtype=bool)
+    if table_ids.dtype.kind == 'U':
+        ids = ids.astype(str)
+        if ids.dtype.itemsize < table_ids.dtype.itemsize:
+            ids = ids.astype(table_ids.dtype)
+        elif ids.dtype.itemsize > table_ids.dtype.itemsize:
+            table_ids = table_ids.astype(ids.dtype)
+    elif len(ids) and ids.dtype.kind not in 'iuf':
+        keys = np.zeros(len(ids), dtype=table_ids.dtype)
+        convert = int if table_ids.dtype.kind in 'iu' else float
+        for i, v_id in enumerate(ids.tolist()):
+            try:
+                keys[i] = convert(v_id)
+            except (TypeError, ValueError, OverflowError):
+                valid[i] = False
+        ids = keys
+
+    return ids, table_ids, valid
+
+# Привязка completeness_coef одним проходом по таблице полноты (Profiler.read_completeness).
+# Если вершины идут в порядке строк файла, значения берутся по номеру строки,
+# иначе id ищутся в отсортированной копии столбца id
+def attach_completeness(vertices, path):
+    table = Profiler.read_completeness(path)
+    ids, table_ids, valid = comparable_ids(vertices, table['id'])
+
+    if len(ids) == len(table) and np.array_equal(ids, table_ids):
+        values = np.asarray(table['completeness'])
+        found = np.ones(len(ids), dtype=bool)
+    elif len(table) and len(ids):
+        order = np.argsort(table_ids, kind='stable')
+        sorted_ids = table_ids[order]
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), len(table) - 1)
+        found = sorted_ids[positions] == ids
+        values = np.asarray(table['completeness'])[order[positions]]
+    else:
+        return vertices
+    found &= valid & ~np.isnan(values)
+
+    for vertex, value, ok in zip(vertices, values.tolist(), found.tolist()):
+        if ok:
+            vertex.completeness_coef = value
 
     return vertices
 
-def parse_csv_to_vertices(file_path):
-    # Читаем CSV файл с помощью pandas
-    df = pd.read_csv(file_path)
+# comp.json - список записей {'Индекс': id, 'Полнота': доля}; быстрее читать comp.npy (attach_completeness)
+def parse_json_to_vertices(vertices, json_file):
+    return attach_completeness(vertices, json_file)
 
+def parse_csv_to_vertices(file_path, columnar=False):
     # Создаем список для хранения объектов Vertex
     vertices = []
 
-    # Проходим по каждой строке DataFrame
-    for index, row in df.iterrows():
-        client_id = row['client_id']  # Предполагаем, что у вас есть столбец client_id
-        properties_set = set()
+    for chunk in parse_csv_to_vertices_chunks(file_path, columnar=columnar):
+        vertices.extend(chunk)
 
+    return vertices
+
+# Потоковый вариант parse_csv_to_vertices: читает CSV кусками по chunk_size строк
+# и отдает списки вершин, не держа в памяти весь DataFrame.
+# columnar=True кладет свойства в общий PropertyStore целыми столбцами
+def parse_csv_to_vertices_chunks(file_path, chunk_size=100000, columnar=False):
+    store = None
+    for df in pd.read_csv(file_path, chunksize=chunk_size):
         # Обходим все остальные столбцы, которые будут использоваться как свойства
-        for col in df.columns:
-            if col != 'client_id':  # Игнорируем столбец client_id
-                property_name = col
-                property_value = row[col]
-                properties_set.add(Property(name=property_name, value=property_value))
+        columns = [col for col in df.columns if col != 'client_id']
 
-        # Создаем объект Vertex и добавляем его в список
-        vertex = Vertex(id=client_id, properties=properties_set)
-        vertices.append(vertex)
+        if columnar:
+            if store is None:
+                store = PropertyStore(columns)
+            rows = store.extend_from_dataframe(df)
+            yield [Vertex(id=client_id, store=store, row=row) for client_id, row in zip(df['client_id'].tolist(), rows)]
+            continue
 
-    return vertices
+        vertices = []
+        # itertuples отдает строки кортежами без создания Series на каждую строку
+        for client_id, *values in df[['client_id', *columns]].itertuples(index=False, name=None):
+            properties_set = {Property(name=col, value=value) for col, value in zip(columns, values)}
+            vertices.append(Vertex(id=client_id, properties=properties_set))
+
+        yield vertices
+
+def stream_test(file_path='dataset.csv', chunk_size=100000, columnar=True):
+    graph = MultiGraph()
+    rows = LoadWizard.stream_to_graph(graph, parse_csv_to_vertices_chunks(file_path, chunk_size, columnar))
+    print(f'Вершин в графе: {len(graph.vertices)}, прочитано строк: {rows}')
+
+    return graph
+
+# Поиск кандидатов в дубли блокировкой: ребра только между вершинами с общим ключом
+def blocking_test(file_path='dataset.csv', max_block_size=100):
+    graph = stream_test(file_path)
+
+    start_time = time.time()
+    index = BlockingIndex(max_block_size=max_block_size)
+    index.add_vertices(graph.vertices.values())
+    edges = index.add_edges(graph)
+    end_time = time.time()
+    print(f'Блоков: {len(index.blocks)}, пропущено больших: {index.skipped_blocks}, '
+          f'ребер-кандидатов: {edges} ({end_time - start_time:.2f}с.)')
+
+    return graph
+
+# Нечеткие дубли по n-граммам свойства (MinHash + LSH), ребра с оценкой Жаккара
+def minhash_test(file_path='dataset.csv', property_name='client_fio_full', min_similarity=0.5):
+    graph = stream_test(file_path)
+
+    start_time = time.time()
+    index = MinHashIndex(property_name)
+    edges = index.add_edges(graph, min_similarity=min_similarity)
+    end_time = time.time()
+    print(f'MinHash по {property_name}: {len(index.signatures)} вершин, ребер: {edges} ({end_time - start_time:.2f}с.)')
+
+    return graph
 
 if __name__ == '__main__':
     new_test()
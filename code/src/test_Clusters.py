@@ -0,0 +1,43 @@
+import pytest
+
+from Clusters import ClusterBuilder
+from MultiGraph import *
+
+# (v1, v2, вес): ребро 3-4 сливает кластеры {1, 2, 3} и {4, 5}, ребро ниже порога не учитывается
+EDGES = [(1, 2, 0.9), (2, 3, 0.7), (4, 5, 0.8), (6, 7, 0.6), (7, 8, 0.2), (3, 4, 0.5), (2, 3, 0.65)]
+
+
+def build_graph():
+    graph = MultiGraph([Vertex(i) for i in range(1, 10)])
+    edges = [Edge(graph.edge_ids.allocate(), weight, v1, v2) for v1, v2, weight in EDGES]
+    return graph, edges
+
+
+def clusters(graph):
+    return sorted((sorted(hyperedge.v_ids), hyperedge.agr_weight) for hyperedge in graph.hyperedges)
+
+
+def memberships(graph):
+    return {v_id: sorted(sorted(hyperedge.v_ids) for hyperedge in vertex.hyperedges)
+            for v_id, vertex in graph.vertices.items()}
+
+
+def test_incremental_matches_build():
+    graph, edges = build_graph()
+    for edge in edges:
+        graph.add_edge(edge)
+    ClusterBuilder(graph).build()
+
+    incremental, edges = build_graph()
+    builder = ClusterBuilder(incremental)
+    # Сначала гиперребра получают два отдельных кластера, затем ребро 3-4 их сливает
+    builder.add_edges(edges[:5])
+    assert sorted(sorted(hyperedge.v_ids) for hyperedge in incremental.hyperedges) == [[1, 2, 3], [4, 5], [6, 7]]
+    for edge in edges[5:]:
+        builder.add_edge(edge)
+    builder.emit()
+
+    assert [members for members, _ in clusters(incremental)] == [[1, 2, 3, 4, 5], [6, 7]]
+    assert [weight for _, weight in clusters(incremental)] == pytest.approx([weight for _, weight in clusters(graph)])
+    assert [members for members, _ in clusters(incremental)] == [members for members, _ in clusters(graph)]
+    assert memberships(incremental) == memberships(graph)
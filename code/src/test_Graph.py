@@ -0,0 +1,50 @@
+from Graph import *
+from MergeWizard import MergeWizard
+
+
+def build_graph():
+    graph = CombinedGraph()
+    vertices = {name: Vertex(name) for name in 'abcd'}
+    graph.fill_vertices(vertices.values())
+    graph.fill_edges([Edge(1, vertices['a'], vertices['b'], 2), Edge(2, vertices['b'], vertices['c'], 4),
+                      Edge(3, vertices['a'], vertices['c'], 6), Edge(4, vertices['c'], vertices['d'], 1)])
+    hyperedge = Hyperedge('h', [vertices[name] for name in 'abc'])
+    graph.fill_hyperedges([hyperedge])
+    return graph, hyperedge
+
+
+def test_remove_vertex_detaches_hyperedges():
+    graph, hyperedge = build_graph()
+    graph.remove_vertex('c')
+
+    assert 'c' not in graph.incidence
+    assert list(hyperedge.vertices) == ['a', 'b']
+    assert [edge.id for edge in hyperedge.edges] == [1]
+    assert hyperedge.weight_sum == 2
+    assert hyperedge.get_max_weight() == 2
+
+    # Без ребер к удаленной вершине аномалии нет и гиперребро не разваливается
+    graph.calculate_all_hyperedge_weights()
+    graph.check_hyperedge(hyperedge)
+    assert list(hyperedge.vertices) == ['a', 'b']
+
+
+def test_remove_vertex_from_hyperedge_drops_empty_incidence():
+    graph, hyperedge = build_graph()
+    graph.remove_vertex_from_hyperedge('b', hyperedge)
+
+    assert 'b' not in graph.incidence
+    assert graph.incidence['a'] == {hyperedge}
+    assert hyperedge.weight_sum == 6
+
+
+def test_merge_keeps_new_vertex_in_hyperedge():
+    graph, hyperedge = build_graph()
+    new_vertex = MergeWizard.merge_pair_vertices(graph.vertices['a'], graph.vertices['b'], graph).vertex
+
+    assert set(hyperedge.vertices) == {'c', new_vertex.name}
+    assert graph.incidence[new_vertex.name] == {hyperedge}
+    assert 'a' not in graph.incidence and 'b' not in graph.incidence
+    # Ребра a-c и b-c усреднены в одно внутреннее ребро нового узла с c
+    assert [edge.weight for edge in hyperedge.edges] == [5]
+    assert hyperedge.weight_sum == 5
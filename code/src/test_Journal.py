@@ -0,0 +1,42 @@
+import copy
+
+import pytest
+
+from Journal import MergeJournal
+from MultiGraph import *
+
+
+def build_graph():
+    store = PropertyStore(['name', 'phone'])
+    graph = MultiGraph([Vertex(i, store=store, row=store.append_row([f'name{i}', f'{i:04}'], [1, 1]))
+                        for i in range(1, 31)])
+    for i in range(1, 30, 3):
+        graph.add_hyperedge(Hyperedge(graph.hyperedge_ids.allocate(), 1.0, [i, i + 1, i + 2]))
+    # Пересекающиеся гиперребра сливаются в один кластер
+    graph.add_hyperedge(Hyperedge(graph.hyperedge_ids.allocate(), 1.0, [3, 4]))
+    return graph
+
+
+def state(graph):
+    return (
+        {v_id: [vertex.get_property(name) for name in ('name', 'phone')] for v_id, vertex in graph.vertices.items()},
+        dict(graph.lineage),
+        sorted((hyperedge.id, list(hyperedge.v_ids)) for hyperedge in graph.hyperedges),
+        graph.vertices[next(iter(graph.vertices))].store.size,
+        graph.vertex_ids.next_id,
+    )
+
+
+@pytest.mark.parametrize('snapshot_every', [0, 1, 4])
+def test_resume_after_collapse_hyperedges(tmp_path, snapshot_every):
+    graph = build_graph()
+    original = copy.deepcopy(graph)
+    path = str(tmp_path / 'merge.journal')
+    journal = MergeJournal(path, snapshot_every=snapshot_every)
+    journal.attach(graph)
+    graph.collapse_hyperedges()
+    journal.close()
+
+    resumed = MergeJournal.resume(path, original)
+    assert state(resumed) == state(graph)
+    assert all(v_id in resumed.vertices for hyperedge in resumed.hyperedges for v_id in hyperedge.v_ids)
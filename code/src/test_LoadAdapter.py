@@ -0,0 +1,15 @@
+from LoadAdapter import LoadWizard
+
+
+def test_columnar_rows_of_any_length(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('a,b,c\n1,2,3\n4,5\n6,7,8,9\n', encoding='utf-8')
+
+    vertices = LoadWizard.parse_csv(str(path), columnar=True)
+    rows = [[vertex.get_property(name) for name in 'abc'] for vertex in vertices]
+    assert rows == [['1', '2', '3'], ['4', '5', None], ['6', '7', '8']]
+    assert vertices[0].store.size == 3
+    assert all(len(column) == 3 for column in vertices[0].store.values)
+
+    rowwise = LoadWizard.parse_csv(str(path))
+    assert [[vertex.get_property(name) for name in 'abc'] for vertex in rowwise] == rows
@@ -0,0 +1,63 @@
+from MultiGraph import *
+
+
+def build_graph(count):
+    return MultiGraph([Vertex(i) for i in range(1, count + 1)])
+
+
+def test_parallel_edges_are_kept():
+    graph = build_graph(2)
+    blocking = Edge(graph.edge_ids.allocate(), 0.9, 1, 2)
+    minhash = Edge(graph.edge_ids.allocate(), 0.6, 2, 1)
+    graph.add_edge(blocking)
+    graph.add_edge(minhash)
+
+    assert graph.edges == {blocking, minhash}
+    assert graph.vertices[1].get_edges(2) == [blocking, minhash]
+    assert set(graph.vertices[2].edges) == {blocking, minhash}
+
+    graph.remove_edge(blocking)
+    assert graph.edges == {minhash}
+    assert graph.vertices[1].get_edge(2) is minhash
+    assert graph.vertices[2].get_edges(1) == [minhash]
+
+    graph.remove_edge(minhash)
+    assert not graph.edges
+    assert not graph.vertices[1].edges and not graph.vertices[2].edges
+
+
+def test_merge_averages_parallel_edges_pairwise():
+    graph = build_graph(3)
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 0.2, 1, 3))
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 0.4, 1, 3))
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 0.6, 2, 3))
+
+    new_vertex = graph.merge_vertex(graph.vertices[1], graph.vertices[2], True).vertex
+
+    assert sorted(edge.weight for edge in new_vertex.get_edges(3)) == [0.4, 0.4]
+    assert len(graph.edges) == 2
+    assert set(graph.vertices[3].edges) == graph.edges
+
+
+def test_history_reverts_lineage_and_store_rows():
+    store = PropertyStore(['name'])
+    graph = MultiGraph([Vertex(i, store=store, row=store.append_row([f'v{i}'])) for i in range(1, 5)])
+    history = HistoryManager(graph)
+    first = graph.merge_vertex(graph.vertices[1], graph.vertices[2], True)
+    history.write_step(first)
+    history.write_step(graph.merge_vertex(first.vertex, graph.vertices[3], True))
+    lineage = dict(graph.lineage)
+    size = store.size
+
+    for _ in range(3):
+        history.go_to(-1)
+        assert graph.lineage == {}
+        assert store.size == 4
+        assert graph.get_originals(1) == [1]
+        history.go_to(1)
+        assert graph.lineage == lineage
+        assert store.size == size
+
+    golden = history.history[-1].vertex
+    assert graph.get_originals(golden.id) == [1, 2, 3]
+    assert golden.get_property('name') in {'v1', 'v2', 'v3'}
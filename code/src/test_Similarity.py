@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import Similarity as module
+from Similarity import Similarity
+
+VALUES = [np.nan, None, 0, 12345, 3.5, '', ' ', 'a', 'MARTHA', 'MARHTA', 'DIXON', 'DICKSONX',
+          'Иванов', 'Иваноф', 'Ёлкина', 'елкина', 'Ωμέγα', '名字', 'ab😀cd', 'abcd😀', 'nan', '12354']
+
+
+def jaro_numpy_to_reference(values, reference):
+    codes1, lengths1 = Similarity.encode(values)
+    codes2, lengths2 = Similarity.encode([reference])
+    return Similarity.jaro_rows_numpy(codes1, lengths1, codes2, lengths2)
+
+
+def jaro_numpy_pairs(values1, values2):
+    codes1, lengths1 = Similarity.encode(values1)
+    codes2, lengths2 = Similarity.encode(values2)
+    return Similarity.jaro_rows_numpy(codes1, lengths1, codes2, lengths2)
+
+
+# numba-путь (jaro_rows) и запасной numpy-путь должны совпадать со скалярным jaro_metric
+@pytest.mark.parametrize('to_reference', [
+    pytest.param(Similarity.jaro_to_reference, id='numba', marks=pytest.mark.skipif(module.numba is None, reason='нет numba')),
+    pytest.param(jaro_numpy_to_reference, id='numpy'),
+])
+def test_jaro_to_reference_matches_scalar(to_reference):
+    for reference in VALUES:
+        expected = [Similarity.jaro_metric(value, reference) for value in VALUES]
+        assert np.allclose(to_reference(VALUES, reference), expected), reference
+
+
+@pytest.mark.parametrize('pairs', [
+    pytest.param(Similarity.jaro_pairs, id='numba', marks=pytest.mark.skipif(module.numba is None, reason='нет numba')),
+    pytest.param(jaro_numpy_pairs, id='numpy'),
+])
+def test_jaro_pairs_matches_scalar(pairs):
+    values1 = [value1 for value1 in VALUES for _ in VALUES]
+    values2 = [value2 for _ in VALUES for value2 in VALUES]
+    expected = [Similarity.jaro_metric(value1, value2) for value1, value2 in zip(values1, values2)]
+    assert np.allclose(pairs(values1, values2), expected)
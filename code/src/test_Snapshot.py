@@ -0,0 +1,48 @@
+from MultiGraph import *
+from Snapshot import GraphSnapshot
+
+
+def build_graph(count):
+    store = PropertyStore(['name'])
+    graph = MultiGraph([Vertex(i, store=store, row=store.append_row([f'v{i}'])) for i in range(count)])
+    for i in range(count - 1):
+        graph.add_edge(Edge(graph.edge_ids.allocate(), 0.5, i, i + 1))
+    return graph
+
+
+def wrong_names(graph):
+    # Исходные вершины - id 0..99, золотая запись получает следующий id
+    return [v_id for v_id, vertex in graph.vertices.items() if v_id < 100 and vertex.get_property('name') != f'v{v_id}']
+
+
+def test_save_over_loaded_snapshot_keeps_live_graph(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    GraphSnapshot.save(build_graph(100), path)
+    graph = GraphSnapshot.load(path)
+    golden = graph.merge_cluster([0, 1])
+
+    GraphSnapshot.save(graph, path)
+
+    assert wrong_names(graph) == []
+    reloaded = GraphSnapshot.load(path)
+    assert wrong_names(reloaded) == []
+    assert reloaded.lineage == {golden.id: (0, 1)}
+    assert reloaded.vertices[golden.id].get_property('name') in {'v0', 'v1'}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['snapshot']
+
+
+def test_open_maps_topology_without_building_graph(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    graph = build_graph(5)
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 0.7, 1, 2))
+    graph.add_hyperedge(Hyperedge(graph.hyperedge_ids.allocate(), 1.0, [0, 4]))
+    GraphSnapshot.save(graph, path)
+
+    arrays = GraphSnapshot.open(path)
+    assert arrays.vertex_count == 5
+    assert list(arrays.ids) == [0, 1, 2, 3, 4]
+    neighbours, edges = arrays.neighbours(2)
+    assert sorted(neighbours.tolist()) == [1, 1, 3]
+    assert sorted(arrays.edge_weight[edges].tolist()) == [0.5, 0.5, 0.7]
+    assert arrays.members(0).tolist() == [0, 4]
+    assert arrays.value(3, 'name') == 'v3'
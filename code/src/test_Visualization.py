@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+
+from MultiGraph import *
+from Visualization import GraphVisual, HistoryView
+
+
+def test_neighbourhood_accepts_int_center():
+    vertices, edges, _ = GraphVisual.neighbourhood([1, 2, 3], [(1, 2, 1.0)], [], 1, 1)
+    assert vertices == [1, 2]
+    assert edges == [(1, 2, 1.0)]
+
+    vertices, _, _ = GraphVisual.neighbourhood([1, 2, 3], [(1, 2, 1.0)], [], (1, 3), 1)
+    assert sorted(vertices) == [1, 2, 3]
+
+
+def test_graph_output_keeps_positions_of_passed_dict():
+    graph = MultiGraph([Vertex(i) for i in range(1, 5)])
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 1.0, 1, 2))
+    graph.add_edge(Edge(graph.edge_ids.allocate(), 1.0, 2, 3))
+    vertices, edges, hyperedges = GraphVisual.multigraph_adapter(graph)
+
+    pos = {}
+    GraphVisual.graph_output(vertices, edges, hyperedges, center=2, radius=1, show=False, pos=pos)
+    assert set(pos) == {1, 2, 3}
+    first = dict(pos)
+    GraphVisual.graph_output(vertices, edges, hyperedges, show=False, pos=pos)
+    assert set(pos) == {1, 2, 3, 4}
+    assert all(pos[node] == point for node, point in first.items())
+
+
+def shown(traces):
+    return np.count_nonzero(~np.isnan(np.concatenate([np.asarray(trace.x, float) for trace in traces])))
+
+
+def check_view(view, graph):
+    edges = {edge.id for edge in graph.edges if edge.v1_id in graph.vertices and edge.v2_id in graph.vertices}
+    assert set(view.nodes.slots) == set(graph.vertices)
+    assert set(view.edges.slots) == edges
+    data = view.figure.data
+    assert len(data) == view.edges.pages + view.nodes.pages
+    assert shown(data[:view.edges.pages]) == 2 * len(edges)
+    assert shown(data[view.edges.pages:]) == len(graph.vertices)
+    assert all(trace.mode == 'lines' for trace in data[:view.edges.pages])
+
+
+def test_history_view_steps_across_merges_without_debug(monkeypatch):
+    monkeypatch.setattr(HistoryView, 'PAGE', 4)
+    random.seed(7)
+    graph = MultiGraph([Vertex(i) for i in range(1, 13)])
+    for v1, v2 in [(1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 1), (7, 8), (8, 9), (10, 11), (11, 12), (12, 7)]:
+        graph.add_edge(Edge(graph.edge_ids.allocate(), 1.0, v1, v2))
+    history = HistoryManager(graph)
+    for _ in range(6):
+        v1, v2 = random.sample(list(graph.vertices.values()), 2)
+        history.write_step(graph.merge_vertex(v1, v2))
+    history.go_to(-1)
+
+    view = HistoryView(history, widget=False)
+    check_view(view, graph)
+    for step in [0, 1, 5, 2, -1, 5, 3]:
+        view.go_to(step)
+        check_view(view, graph)
+
+
+def test_history_view_sends_only_changed_pages(monkeypatch):
+    monkeypatch.setattr(HistoryView, 'PAGE', 4)
+    graph = MultiGraph([Vertex(i) for i in range(1, 17)])
+    for i in range(1, 16):
+        graph.add_edge(Edge(graph.edge_ids.allocate(), 1.0, i, i + 1))
+    history = HistoryManager(graph)
+    history.write_step(graph.merge_vertex(graph.vertices[15], graph.vertices[16], True))
+    history.go_to(-1)
+
+    view = HistoryView(history, widget=False)
+    before = [(trace.x, trace.y) for trace in view.figure.data]
+    view.go_to(0)
+    check_view(view, graph)
+    changed = [i for i, trace in enumerate(view.figure.data[:len(before)]) if trace.x is not before[i][0]]
+    # Ребра 14-15 и 15-16 лежат на последней странице ребер, вершины 15 и 16 - на последней странице узлов,
+    # новые вершина 17 и ребро 14-17 занимают освободившиеся слоты тех же страниц
+    assert changed == [view.edges.pages - 1, len(before) - 1]
+    assert len(view.figure.data) == len(before)
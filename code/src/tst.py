@@ -1,149 +1,74 @@
 import json
 import time
 from copy import deepcopy
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 
-# Функция для поиска первой строки с включением символа '@'
-def find_first_column_with_at(df):
-    found = False
-    index = None
-    column_index = None
-
-    for i, row in df.iterrows():
-        for j, cell in enumerate(row):
-            if isinstance(cell, str) and '@' in cell:
-                found = True
-                index = i
-                column_index = j
-                break
-        if found:
-            break
-
-    return index, column_index
-
-def jaro_metric(S1, S2):
-    s1 = str(S1)
-    s2 = str(S2)
-    # Если одна из строк пустая, возвращаем 0
-    if not s1 or not s2:
-        return 0.0
-
-    # Определение максимального расстояния для сравнения символов
-    max_dist = max(len(s1), len(s2)) // 2 - 1
-
-    # Списки для хранения индексов совпавших символов
-    match_indices_s1 = [-1] * len(s1)
-    match_indices_s2 = [-1] * len(s2)
-
-    # Считаем количество совпадений
-    matches = 0
-    for i, char1 in enumerate(s1):
-        start = max(0, i - max_dist)
-        end = min(i + max_dist + 1, len(s2))
-        for j in range(start, end):
-            if s2[j] == char1 and match_indices_s2[j] == -1:
-                matches += 1
-                match_indices_s1[i] = j
-                match_indices_s2[j] = i
-                break
-
-    # Рассчитываем количество транспозиций
-    transpositions = sum(
-        1 for k in range(matches) if match_indices_s1[k] != match_indices_s2[match_indices_s1[k]]
-    )
-
-    # Деление числа транспозиций пополам
-    transpositions //= 2
-
-    # Вычисляем итоговый коэффициент Джаро
-    if matches == 0:
-        return 0.0
-    else:
-        return (
-                matches / len(s1) +
-                matches / len(s2) +
-                (matches - transpositions) / matches
-        ) / 3.0
+from CleanData import TranslationTable
+from Profiler import Profiler
+from Similarity import Similarity
 
 def extended_alphabet_index(char):
     alphabet = "абвгдежзийклмнопрстуфхцчшщъыьэюяabcdefghijklmnopqrstuvwxyz0123456789"
     return alphabet.find(char.lower()) + 1
 
-def trans(s2):
-    s1 = 'а' * len(s2)
-    differences = ""
+# Код одного символа: разница его номера в расширенном алфавите с буквой 'а'
+def trans_char(c2):
+    index1 = extended_alphabet_index('а')
+    index2 = extended_alphabet_index(c2)
 
-    for c1, c2 in zip(s1, s2):
-        index1 = extended_alphabet_index(c1)
-        index2 = extended_alphabet_index(c2)
+    if index1 == 0 or index2 == 0:
+        return "0"
 
-        if index1 == 0 or index2 == 0:
-            differences += "0"
-            continue
+    difference = abs(index1 - index2)
 
-        difference = abs(index1 - index2)
+    if difference == 0:
+        return "0"
 
-        if difference == 0:
-            differences += "0"
-            continue
+    difference_base32 = format(difference, 'x')
+
+    if difference < 32:
+        return difference_base32
+    else:
+        # Новый набор символов для системы счисления Base64
+        chars = "абвгдежзийклмнопрстуфхцчшщъыьэюяabcdefghijklmnopqrstuvwxyz0123456789"
+        base32_str = ''
+        while difference:
+            difference, rem = divmod(difference, len(chars))  # Изменено деление на длину нового набора символов
+            base32_str = chars[rem] + base32_str
+        return base32_str
 
-        difference_base32 = format(difference, 'x')
+TRANS_TABLE = TranslationTable(trans_char)
 
-        if difference < 32:
-            differences += difference_base32
-        else:
-            # Новый набор символов для системы счисления Base64
-            chars = "абвгдежзийклмнопрстуфхцчшщъыьэюяabcdefghijklmnopqrstuvwxyz0123456789"
-            base32_str = ''
-            while difference:
-                difference, rem = divmod(difference, len(chars))  # Изменено деление на длину нового набора символов
-                base32_str = chars[rem] + base32_str
-            differences += base32_str
+@lru_cache(maxsize=1 << 16)
+def trans(s2):
+    return s2.translate(TRANS_TABLE)
 
-    return differences
+# Кодирует столбец: каждое уникальное значение один раз
+def trans_column(values):
+    codes, uniques = pd.factorize(values)
+    encoded = np.array([trans(str(value)) for value in uniques] + [''], dtype=object)
+    return pd.Series(encoded[codes], index=values.index)
 
 start_time = time.time()
 
 df = pd.read_csv('ds_dirty_fin_202410041147.csv', index_col=None)
 ddf = deepcopy(df)
 
-# Получаем общее количество записей
-total_records = len(df)
-
-# Поиск первой строки и колонки с символом '@'
-index, column_index = find_first_column_with_at(df)
-
-numeric_columns = df.select_dtypes(include=np.number).columns
-
-# Работа только с числовыми столбцами
-numeric_df = df[numeric_columns]
-#max_values = df.astype(str).map(len).max().max()
-temp_df = numeric_df[1:]
-max_values = max([len(str(x)) for x in temp_df.values.flatten() if x is not None])
+# Заполненность, тип и длины значений столбцов, столбец с '@' - одним векторным проходом
+profiler = Profiler(skip_rows=1)
+profiler.add_chunk(df)
 
 # Процентное соотношение заполненности для каждой колонки
 column_stats = {}
 for column in df.columns[1:-3]:
-    non_null_count = df[column].notna().sum()
-    is_text = df[column].apply(lambda x: isinstance(x, str)).any()
-    percentage_filled = round((non_null_count / total_records) * 100, 2)
+    percentage_filled = np.round(profiler.fill_ratio(column) * 100, 2)
     if percentage_filled < 0:#10
         df.drop(column, axis=1, inplace=True)
     else:
-        if is_text and not df.columns.get_loc(column) == column_index:
-            percentage_filled *= 0.8
-        elif not is_text:
-            non_null_values = df[column].dropna()
-            if not non_null_values.empty:
-                first_non_null_index = non_null_values.first_valid_index()
-                first_non_null_len = len(str(non_null_values.loc[first_non_null_index]))
-                percentage_filled *= np.interp(first_non_null_len, (1, max_values), (0.9, 1.1))
-        '''if column != "JsonID" and column != 'CreationDate':
-            column_stats[column] = f"{percentage_filled}"
-        else: column_stats[column] = f"{0}"'''
-        column_stats[column] = f"{percentage_filled}"
+        column_stats[column] = f"{profiler.column_weight(column)}"
 
 json_data = json.dumps(column_stats, indent=4)
 
@@ -164,8 +89,8 @@ for column in columns_to_convert:
     max_length_index = subset.str.len().argmax()
     longest_string = subset.iloc[max_length_index]
 
-    df[column] = subset.apply(trans)
-    df[column] = subset.apply(jaro_metric, args=(longest_string,))
+    df[column] = trans_column(subset)
+    df[column] = pd.Series(Similarity.jaro_to_reference(subset.to_numpy(), longest_string), index=subset.index)
 
 sorted_columns = sorted(column_stats, key=lambda x: column_stats[x], reverse=True)
 